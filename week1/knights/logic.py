@@ -1,3 +1,4 @@
+import heapq
 import itertools
 
 
@@ -5,15 +6,132 @@ class Sentence():
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
-        raise Exception("nothing to evaluate")
+        return self.fold(
+            lambda symbol: symbol.evaluate(model),
+            lambda sentence, values: sentence.combine(values),
+            lambda sentence, values: sentence.settled(values),
+        )
+
+    def evaluate_partial(self, model):
+        """
+        Evaluates the logical sentence in a partial model, returning None
+        if its value depends on symbols the model does not assign.
+        """
+        return self.fold(
+            lambda symbol: symbol.evaluate_partial(model),
+            lambda sentence, values: sentence.combine(values),
+            lambda sentence, values: sentence.settled(values),
+        )
 
     def formula(self):
         """Returns string formula representing logical sentence."""
-        return ""
+        formula, _ = self.fold(
+            lambda symbol: (symbol.formula(),
+                            Sentence.parenthesize(symbol.formula())
+                            == symbol.formula()),
+            lambda sentence, formulas: sentence.join(formulas),
+        )
+
+        # Flatten the nested pieces in order, and join them only once
+        pieces = []
+        stack = [formula]
+        while stack:
+            piece = stack.pop()
+            if isinstance(piece, str):
+                pieces.append(piece)
+            else:
+                stack.extend(reversed(piece))
+        return "".join(pieces)
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        symbols = set()
+        seen = set()
+        stack = [self]
+        while stack:
+            sentence = stack.pop()
+            if isinstance(sentence, Symbol):
+                symbols.add(sentence.name)
+            elif id(sentence) not in seen:
+                seen.add(id(sentence))
+                stack.extend(sentence.operands())
+        return symbols
+
+    def operands(self):
+        """Returns the sentences this sentence is built from."""
+        return []
+
+    def combine(self, values):
+        """Returns the value of the sentence given values of its operands."""
+        raise Exception("nothing to evaluate")
+
+    def settled(self, values):
+        """Checks if values of the first operands already decide the value."""
+        return False
+
+    def join(self, formulas):
+        """
+        Returns the formula of the sentence given those of its operands.
+        A formula is a string or a list of formulas to be joined in order,
+        so that no string is copied until the whole formula is joined.
+        Each formula is paired with whether it can stand as an operand
+        without parentheses, and the result is paired the same way, so
+        that no formula is scanned again once built.
+        """
+        return "", True
+
+    def fold(self, leaf, combine, settled=None):
+        """
+        Computes a value for the sentence bottom-up with an explicit stack,
+        so that deeply nested sentences do not exhaust the call stack.
+        Symbols are mapped by leaf, and every other sentence by combine
+        given the values of its operands. Remaining operands are skipped
+        once settled reports that the values so far decide the result.
+        """
+        stack = [(self, self.operands(), [])]
+        while True:
+            sentence, operands, values = stack[-1]
+            if len(values) < len(operands) and not (
+                values and settled is not None and settled(sentence, values)
+            ):
+                operand = operands[len(values)]
+                if isinstance(operand, Symbol):
+                    values.append(leaf(operand))
+                else:
+                    stack.append((operand, operand.operands(), []))
+                continue
+            stack.pop()
+            value = combine(sentence, values)
+            if not stack:
+                return value
+            stack[-1][2].append(value)
+
+    def __eq__(self, other):
+        stack = [(self, other)]
+        while stack:
+            sentence, other = stack.pop()
+            if sentence is other:
+                continue
+            if not isinstance(other, type(sentence)):
+                return False
+            if isinstance(sentence, Symbol):
+                if sentence.name != other.name:
+                    return False
+                continue
+            operands = sentence.operands()
+            others = other.operands()
+            if len(operands) != len(others):
+                return False
+            stack.extend(zip(operands, others))
+        return True
+
+    def __hash__(self):
+        return self.fold(
+            hash,
+            lambda sentence, hashes: hash(
+                (type(sentence).__name__, tuple(hashes))
+            ),
+        )
 
     @classmethod
     def validate(cls, sentence):
@@ -41,6 +159,12 @@ class Sentence():
         else:
             return f"({s})"
 
+    @classmethod
+    def nest(cls, formula):
+        """Parenthesizes a formula paired by join, if it needs them."""
+        pieces, enclosed = formula
+        return pieces if enclosed else ["(", pieces, ")"]
+
 
 class Symbol(Sentence):
 
@@ -62,6 +186,10 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
+    def evaluate_partial(self, model):
+        value = model.get(self.name)
+        return None if value is None else bool(value)
+
     def formula(self):
         return self.name
 
@@ -74,23 +202,17 @@ class Not(Sentence):
         Sentence.validate(operand)
         self.operand = operand
 
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
-
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
-
     def __repr__(self):
         return f"Not({self.operand})"
 
-    def evaluate(self, model):
-        return not self.operand.evaluate(model)
+    def operands(self):
+        return [self.operand]
 
-    def formula(self):
-        return "¬" + Sentence.parenthesize(self.operand.formula())
+    def combine(self, values):
+        return None if values[0] is None else not values[0]
 
-    def symbols(self):
-        return self.operand.symbols()
+    def join(self, formulas):
+        return ["¬", Sentence.nest(formulas[0])], False
 
 
 class And(Sentence):
@@ -99,14 +221,6 @@ class And(Sentence):
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
 
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
-
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
-
     def __repr__(self):
         conjunctions = ", ".join(
             [str(conjunct) for conjunct in self.conjuncts]
@@ -117,17 +231,26 @@ class And(Sentence):
         Sentence.validate(conjunct)
         self.conjuncts.append(conjunct)
 
-    def evaluate(self, model):
-        return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
+    def operands(self):
+        return self.conjuncts
 
-    def formula(self):
-        if len(self.conjuncts) == 1:
-            return self.conjuncts[0].formula()
-        return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
-                           for conjunct in self.conjuncts])
+    def combine(self, values):
+        if False in values:
+            return False
+        return None if None in values else True
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def settled(self, values):
+        return values[-1] is False
+
+    def join(self, formulas):
+        if len(formulas) == 1:
+            return formulas[0]
+        pieces = []
+        for formula in formulas:
+            if pieces:
+                pieces.append(" ∧ ")
+            pieces.append(Sentence.nest(formula))
+        return pieces, not formulas
 
 
 class Or(Sentence):
@@ -136,29 +259,30 @@ class Or(Sentence):
             Sentence.validate(disjunct)
         self.disjuncts = list(disjuncts)
 
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
-
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
-
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
         return f"Or({disjuncts})"
 
-    def evaluate(self, model):
-        return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
+    def operands(self):
+        return self.disjuncts
 
-    def formula(self):
-        if len(self.disjuncts) == 1:
-            return self.disjuncts[0].formula()
-        return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
-                            for disjunct in self.disjuncts])
+    def combine(self, values):
+        if True in values:
+            return True
+        return None if None in values else False
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def settled(self, values):
+        return values[-1] is True
+
+    def join(self, formulas):
+        if len(formulas) == 1:
+            return formulas[0]
+        pieces = []
+        for formula in formulas:
+            if pieces:
+                pieces.append(" ∨  ")
+            pieces.append(Sentence.nest(formula))
+        return pieces, not formulas
 
 
 class Implication(Sentence):
@@ -168,28 +292,24 @@ class Implication(Sentence):
         self.antecedent = antecedent
         self.consequent = consequent
 
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
-
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
-
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
 
-    def evaluate(self, model):
-        return ((not self.antecedent.evaluate(model))
-                or self.consequent.evaluate(model))
+    def operands(self):
+        return [self.antecedent, self.consequent]
 
-    def formula(self):
-        antecedent = Sentence.parenthesize(self.antecedent.formula())
-        consequent = Sentence.parenthesize(self.consequent.formula())
-        return f"{antecedent} => {consequent}"
+    def combine(self, values):
+        if values[0] is False or values[-1] is True:
+            return True
+        return None if None in values else False
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def settled(self, values):
+        return values[0] is False
+
+    def join(self, formulas):
+        antecedent = Sentence.nest(formulas[0])
+        consequent = Sentence.nest(formulas[1])
+        return [antecedent, " => ", consequent], False
 
 
 class Biconditional(Sentence):
@@ -199,65 +319,703 @@ class Biconditional(Sentence):
         self.left = left
         self.right = right
 
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
-
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
-
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
 
-    def evaluate(self, model):
-        return ((self.left.evaluate(model)
-                 and self.right.evaluate(model))
-                or (not self.left.evaluate(model)
-                    and not self.right.evaluate(model)))
+    def operands(self):
+        return [self.left, self.right]
 
-    def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
-        return f"{left} <=> {right}"
+    def combine(self, values):
+        if None in values:
+            return None
+        return values[0] == values[1]
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def settled(self, values):
+        return values[-1] is None
+
+    def join(self, formulas):
+        left = Sentence.nest(formulas[0])
+        right = Sentence.nest(formulas[1])
+        return [left, " <=> ", right], False
 
 
 def model_check(knowledge, query):
     """Checks if knowledge base entails query."""
+    return counterexample(knowledge, query) is None
 
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
-
-        # If model has an assignment for each symbol
-        if not symbols:
 
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
-        else:
+def counterexample(knowledge, query):
+    """
+    Returns a model in which knowledge base is true but query is false,
+    or None if knowledge base entails query.
+    """
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
+    def check_all(knowledge, query, symbols, model):
+        """Searches for a counterexample extending a partial model."""
+
+        # If knowledge base is already false, no extension is a counterexample
+        if knowledge.evaluate_partial(model) is False:
+            return None
+
+        # If query is already true, no extension is a counterexample
+        value = query.evaluate_partial(model)
+        if value is True:
+            return None
+
+        # If query is false while knowledge base is true, any extension is
+        if value is False and knowledge.evaluate_partial(model) is True:
+            model = model.copy()
+            for symbol in symbols:
+                model[symbol] = False
+            return model
+
+        # Choose one of the remaining unused symbols
+        p, remaining = symbols[0], symbols[1:]
+
+        # Look for a counterexample where the symbol is true, then false
+        for value in (True, False):
+            model[p] = value
+            found = check_all(knowledge, query, remaining, model)
+            if found is not None:
+                return found
+        del model[p]
+        return None
 
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
+    # Get all symbols in both knowledge and query
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
 
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
+    # Search for a model where knowledge base holds and query does not
+    return check_all(knowledge, query, symbols, dict())
 
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
 
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+def model_check_many(knowledge, queries):
+    """
+    Checks which of several queries knowledge base entails, enumerating
+    the models of knowledge base only once. Returns a dict mapping each
+    query to whether it is entailed.
+    """
+
+    def check_all(knowledge, undecided, pending, symbols, model):
+        """
+        Refutes queries that are false in some model of knowledge base
+        extending a partial model, among the queries `pending` in this branch.
+        """
+
+        # If knowledge base is already false, no extension is a model of it
+        known = knowledge.evaluate_partial(model)
+        if known is False:
+            return
+
+        # Queries already true need no search below this model, and those
+        # already false while knowledge base is true are refuted outright
+        still_open = []
+        for query in pending:
+            if query not in undecided:
+                continue
+            value = query.evaluate_partial(model)
+            if value is True:
+                continue
+            if value is False and known is True:
+                undecided.remove(query)
+                continue
+            still_open.append(query)
+        if not still_open:
+            return
+
+        # Choose one of the remaining unused symbols
+        p, remaining = symbols[0], symbols[1:]
+
+        # Stop once every query open here has been refuted
+        for value in (True, False):
+            model[p] = value
+            check_all(knowledge, undecided, still_open, remaining, model)
+            if not any(query in undecided for query in still_open):
+                break
+        del model[p]
+
+    queries = list(queries)
+
+    # Get all symbols in knowledge and every query
+    symbols = sorted(set.union(knowledge.symbols(),
+                               *[query.symbols() for query in queries]))
+
+    # Queries still undecided after the search hold in every model
+    undecided = set(queries)
+    check_all(knowledge, undecided, list(undecided), symbols, dict())
+    return {query: query in undecided for query in queries}
+
+
+class CNF():
+    """
+    Conjunctive normal form of logical sentences. Each sentence is given a
+    literal (a positive or negative variable number) defined by clauses,
+    so that its size stays linear in the size of the sentence.
+    """
+
+    def __init__(self):
+        self.variables = dict()
+        self.literals = dict()
+        self.count = 0
+        self.true = None
+        self.clauses = []
+
+    def variable(self):
+        """Allocates a new propositional variable."""
+        self.count += 1
+        return self.count
+
+    def encode(self, sentence):
+        """Returns a literal equivalent to sentence, adding its definition."""
+        return sentence.fold(lambda symbol: self.define(symbol, []),
+                             self.define)
+
+    def define(self, sentence, operands):
+        """
+        Returns a literal equivalent to sentence given literals of its
+        operands, adding clauses defining it. Sentences are looked up by
+        their type and operand literals, so equal sentences share one
+        literal without hashing whole sentences again.
+        """
+        if isinstance(sentence, Symbol):
+            if sentence.name not in self.variables:
+                self.variables[sentence.name] = self.variable()
+            return self.variables[sentence.name]
+
+        if isinstance(sentence, Not):
+            return -operands[0]
+
+        key = (type(sentence).__name__, tuple(operands))
+        if key in self.literals:
+            return self.literals[key]
+
+        if isinstance(sentence, And):
+            literal = self.constant() if not operands else self.variable()
+            for operand in operands:
+                self.add_clause([-literal, operand])
+            if operands:
+                self.add_clause([literal] + [-o for o in operands])
+
+        elif isinstance(sentence, Or):
+            literal = -self.constant() if not operands else self.variable()
+            for operand in operands:
+                self.add_clause([literal, -operand])
+            if operands:
+                self.add_clause([-literal] + operands)
+
+        elif isinstance(sentence, Implication):
+            antecedent, consequent = operands
+            literal = self.variable()
+            self.add_clause([-literal, -antecedent, consequent])
+            self.add_clause([literal, antecedent])
+            self.add_clause([literal, -consequent])
+
+        elif isinstance(sentence, Biconditional):
+            left, right = operands
+            literal = self.variable()
+            self.add_clause([-literal, -left, right])
+            self.add_clause([-literal, left, -right])
+            self.add_clause([literal, left, right])
+            self.add_clause([literal, -left, -right])
 
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+        else:
+            raise TypeError(f"cannot encode {type(sentence).__name__}")
+
+        self.literals[key] = literal
+        return literal
+
+    def constant(self):
+        """Returns a literal that is always true."""
+        if self.true is None:
+            self.true = self.variable()
+            self.add_clause([self.true])
+        return self.true
+
+    def add_clause(self, literals):
+        """Adds a clause, given as a list of literals."""
+        self.clauses.append(list(literals))
+
+
+class KnowledgeBase(CNF):
+    """
+    Incremental knowledge base that answers queries by solving under
+    assumptions. Sentences are converted into clauses once, and clauses
+    learned while answering one query are kept for the next ones.
+    """
+
+    def __init__(self, *sentences):
+        super().__init__()
+        self.consistent = True
+
+        # Solver state
+        self.watches = dict()
+        self.assignment = dict()
+        self.level = dict()
+        self.reason = dict()
+        self.activity = dict()
+        self.heap = []
+        self.trail = []
+        self.trail_lim = []
+        self.head = 0
+        self.learnts = 0
+
+        for sentence in sentences:
+            self.tell(sentence)
+
+    def tell(self, sentence):
+        """Adds a sentence to the knowledge base."""
+        Sentence.validate(sentence)
+        self.backtrack(0)
+
+        # Conjunctions are split into separate sentences, in order
+        stack = [sentence]
+        while stack:
+            sentence = stack.pop()
+            if isinstance(sentence, And):
+                stack.extend(reversed(sentence.conjuncts))
+            elif isinstance(sentence, Or):
+                self.add_clause([self.encode(disjunct)
+                                 for disjunct in sentence.disjuncts])
+            else:
+                self.add_clause([self.encode(sentence)])
+
+    def ask(self, query):
+        """Checks if knowledge base entails query."""
+        Sentence.validate(query)
+        self.backtrack(0)
+        literal = self.encode(query)
+
+        # Knowledge base entails query if it is unsatisfiable without query
+        return not self.solve([-literal])
+
+    def variable(self):
+        """Allocates a new propositional variable."""
+        variable = super().variable()
+        self.activity[variable] = 0.0
+        heapq.heappush(self.heap, (0.0, variable))
+        return variable
+
+    def value(self, literal):
+        """Returns the current value of a literal, or None if unassigned."""
+        value = self.assignment.get(abs(literal))
+        if value is None or literal > 0:
+            return value
+        return not value
+
+    def assign(self, literal, reason):
+        """Assigns a literal true at the current decision level."""
+        variable = abs(literal)
+        self.assignment[variable] = literal > 0
+        self.level[variable] = len(self.trail_lim)
+        self.reason[variable] = reason
+        self.trail.append(literal)
+
+    def watch(self, clause):
+        """Watches the first two literals of a clause."""
+        self.watches.setdefault(clause[0], []).append(clause)
+        self.watches.setdefault(clause[1], []).append(clause)
+
+    def add_clause(self, literals):
+        """Adds a clause at decision level 0."""
+        clause = []
+        for literal in literals:
+            value = self.value(literal)
+            if value is True or -literal in clause:
+                return
+            if value is None and literal not in clause:
+                clause.append(literal)
+        if not clause:
+            self.consistent = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+        else:
+            self.watch(clause)
+
+    def propagate(self):
+        """Propagates unit clauses, returning a conflicting clause if any."""
+        while self.head < len(self.trail):
+            false = -self.trail[self.head]
+            self.head += 1
+            watchers = self.watches.get(false, [])
+            self.watches[false] = kept = []
+            for i, clause in enumerate(watchers):
+
+                # Keep the false literal in the second watched position
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.value(clause[0]) is True:
+                    kept.append(clause)
+                    continue
+
+                # Look for another literal to watch
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches.setdefault(clause[1], []).append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if self.value(clause[0]) is False:
+                        kept.extend(watchers[i + 1:])
+                        self.head = len(self.trail)
+                        return clause
+                    self.assign(clause[0], clause)
+        return None
+
+    def analyze(self, conflict):
+        """Derives a learned clause and backjump level from a conflict."""
+        learnt = [None]
+        seen = set()
+        counter = 0
+        index = len(self.trail)
+        level = len(self.trail_lim)
+        clause = conflict
+        while True:
+            for literal in clause:
+                variable = abs(literal)
+                if variable not in seen and self.level[variable] > 0:
+                    seen.add(variable)
+                    self.activity[variable] += 1.0
+                    heapq.heappush(self.heap,
+                                   (-self.activity[variable], variable))
+                    if self.level[variable] == level:
+                        counter += 1
+                    else:
+                        learnt.append(literal)
+
+            # Walk back along the trail to the next literal to resolve on
+            while True:
+                index -= 1
+                literal = self.trail[index]
+                if abs(literal) in seen:
+                    break
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.reason[abs(literal)]
+        learnt[0] = -literal
+
+        # Backjump to the second highest level in the learned clause
+        if len(learnt) == 1:
+            return learnt, 0
+        second = max(range(1, len(learnt)),
+                     key=lambda k: self.level[abs(learnt[k])])
+        learnt[1], learnt[second] = learnt[second], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def backtrack(self, level):
+        """Undoes all assignments above decision level."""
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            del self.assignment[variable]
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.head = len(self.trail)
+
+    def decide(self):
+        """
+        Returns an unassigned literal to branch on, or None if none. The
+        heap holds every unassigned variable by its current activity, and
+        may also hold assigned variables and outdated activities, which
+        are dropped here; a variable is pushed again whenever its activity
+        grows or it becomes unassigned.
+        """
+        while self.heap:
+            activity, variable = heapq.heappop(self.heap)
+            if (variable not in self.assignment
+                    and -activity == self.activity[variable]):
+                return -variable
+        return None
+
+    def solve(self, assumptions=()):
+        """Checks if knowledge base is satisfiable under assumptions."""
+        if not self.consistent:
+            return False
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+
+                # A conflict with no decisions means no model exists at all
+                if not self.trail_lim:
+                    self.consistent = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.backtrack(level)
+                self.learnts += 1
+                if len(learnt) > 1:
+                    self.watch(learnt)
+                    self.assign(learnt[0], learnt)
+                else:
+                    self.assign(learnt[0], None)
+                continue
+
+            # Decide assumptions first, one per decision level
+            level = len(self.trail_lim)
+            if level < len(assumptions):
+                literal = assumptions[level]
+                value = self.value(literal)
+                if value is False:
+                    self.backtrack(0)
+                    return False
+                self.trail_lim.append(len(self.trail))
+                if value is None:
+                    self.assign(literal, None)
+                continue
+
+            literal = self.decide()
+            if literal is None:
+                self.backtrack(0)
+                return True
+            self.trail_lim.append(len(self.trail))
+            self.assign(literal, None)
+
+
+def condition(clauses, literals):
+    """
+    Simplifies clauses given that literals are true, propagating any unit
+    clauses that result. Returns the remaining clauses and the set of
+    literals made true, or None if some clause is falsified.
+    """
+    assigned = set()
+    pending = list(literals)
+    while pending:
+        literal = pending.pop()
+        if literal in assigned:
+            continue
+        if -literal in assigned:
+            return None
+        assigned.add(literal)
+        reduced = []
+        for clause in clauses:
+            if literal in clause:
+                continue
+            if -literal in clause:
+                clause = clause - {-literal}
+                if not clause:
+                    return None
+                if len(clause) == 1:
+                    pending.extend(clause)
+            reduced.append(clause)
+        clauses = reduced
+    return frozenset(clauses), assigned
+
+
+def components(clauses):
+    """Splits clauses into connected groups that share no variables."""
+    occurrences = dict()
+    for clause in clauses:
+        for literal in clause:
+            occurrences.setdefault(abs(literal), []).append(clause)
+
+    groups = []
+    seen = set()
+    for clause in clauses:
+        if clause in seen:
+            continue
+        seen.add(clause)
+        group = []
+        stack = [clause]
+        while stack:
+            current = stack.pop()
+            group.append(current)
+            for literal in current:
+                for other in occurrences[abs(literal)]:
+                    if other not in seen:
+                        seen.add(other)
+                        stack.append(other)
+        groups.append(frozenset(group))
+    return groups
+
+
+def variables_of(clauses):
+    """Returns the set of variables occurring in clauses."""
+    return {abs(literal) for clause in clauses for literal in clause}
+
+
+def model_count(sentence, symbols=None):
+    """
+    Returns the number of models of sentence over symbols, which default
+    to the symbols of sentence. Clauses that share no variables are
+    counted separately, and counts of repeated components are cached.
+    Counting works through an explicit stack of pending counts, so that
+    sentences over many symbols do not exhaust the call stack.
+    """
+    cache = dict()
+
+    def expand(clauses):
+        """
+        Returns the number of models of clauses over the variables
+        occurring in them if it is already known, or otherwise a frame
+        for counting them from parts: independent components, whose counts
+        multiply, or the clauses with the most frequent variable set each
+        way, whose counts add, each weighted by its variables set freely.
+        """
+        if not clauses:
+            return 1
+        if clauses in cache:
+            return cache[clauses]
+
+        # Independent components multiply
+        groups = components(clauses)
+        if len(groups) > 1:
+            return {"clauses": clauses, "multiply": True, "total": 1,
+                    "parts": iter([(group, 1) for group in groups])}
+
+        # Otherwise branch on the most frequent variable
+        occurrences = dict()
+        for clause in clauses:
+            for literal in clause:
+                variable = abs(literal)
+                occurrences[variable] = occurrences.get(variable, 0) + 1
+        variable = max(occurrences, key=occurrences.get)
+        parts = []
+        for literal in (variable, -variable):
+            conditioned = condition(clauses, [literal])
+            if conditioned is not None:
+                reduced, assigned = conditioned
+                free = (len(occurrences) - len(assigned)
+                        - len(variables_of(reduced)))
+                parts.append((reduced, 2 ** free))
+        return {"clauses": clauses, "multiply": False, "total": 0,
+                "parts": iter(parts)}
+
+    def count(clauses):
+        """Counts models of clauses over the variables occurring in them."""
+        stack = []
+        result = expand(clauses)
+        while True:
+            if isinstance(result, dict):
+                stack.append(result)
+            elif not stack:
+                return result
+
+            # Add the count just finished to the frame waiting for it
+            else:
+                frame = stack[-1]
+                if frame["multiply"]:
+                    frame["total"] *= result
+                else:
+                    frame["total"] += result * frame["weight"]
+
+            # Count the frame's next part, or finish it once all are
+            # counted or a component has no models
+            frame = stack[-1]
+            part = None
+            if frame["total"] or not frame["multiply"]:
+                part = next(frame["parts"], None)
+            if part is not None:
+                clauses, frame["weight"] = part
+                result = expand(clauses)
+            else:
+                stack.pop()
+                cache[frame["clauses"]] = result = frame["total"]
+
+    cnf, clauses, assigned = compile_models(sentence)
+    if clauses is None:
+        return 0
+
+    # Variables left unconstrained may take either value
+    free = cnf.count - len(assigned) - len(variables_of(clauses))
+    return count(clauses) * 2 ** (free + extra_symbols(sentence, symbols))
+
+
+def models(sentence, symbols=None):
+    """
+    Yields every model of sentence over symbols, which default to the
+    symbols of sentence, one at a time as the search finds them. Symbols
+    are set one at a time in order, searching depth first with an
+    explicit stack of the clauses left at each depth.
+    """
+    cnf, clauses, assigned = compile_models(sentence)
+    if clauses is None:
+        return
+    extra_symbols(sentence, symbols)
+    names = sorted(symbols if symbols is not None else cnf.variables)
+
+    # Clauses left and literals implied after setting the first symbols,
+    # one entry per symbol set so far, with how many values were tried
+    model = dict()
+    stack = [[clauses, assigned, 0]]
+    while stack:
+        frame = stack[-1]
+        clauses, assigned, tried = frame
+        depth = len(stack) - 1
+
+        # With every symbol set, check the clauses left can be satisfied
+        if depth == len(names):
+            if satisfiable(clauses):
+                yield model.copy()
+            stack.pop()
+            continue
+
+        name = names[depth]
+        if tried == 2:
+            del model[name]
+            stack.pop()
+            continue
+        value = (True, False)[tried]
+        frame[2] += 1
+        model[name] = value
+        variable = cnf.variables.get(name)
+        literal = None
+        if variable is not None:
+            literal = variable if value else -variable
+
+        # Symbols outside sentence, or already implied, need no search
+        if literal is None or literal in assigned:
+            stack.append([clauses, assigned, 0])
+        elif -literal not in assigned:
+            conditioned = condition(clauses, [literal])
+            if conditioned is not None:
+                reduced, implied = conditioned
+                stack.append([reduced, assigned | implied, 0])
+
+
+def compile_models(sentence):
+    """
+    Encodes sentence as clauses asserting it is true. Returns the encoding,
+    the clauses left after unit propagation, and the literals it assigned.
+    """
+    Sentence.validate(sentence)
+    cnf = CNF()
+    root = cnf.encode(sentence)
+    clauses = frozenset(frozenset(clause) for clause in cnf.clauses)
+
+    # Propagate the unit clauses of the encoding along with the root, such
+    # as the one making the constant true for empty conjunctions
+    units = [literal for clause in clauses if len(clause) == 1
+             for literal in clause]
+    conditioned = condition(clauses, [root] + units)
+    if conditioned is None:
+        return cnf, None, None
+    clauses, assigned = conditioned
+    return cnf, clauses, assigned
+
+
+def satisfiable(clauses):
+    """Checks if clauses have a model, branching on one variable at a time."""
+    stack = [clauses]
+    while stack:
+        clauses = stack.pop()
+        if not clauses:
+            return True
+        variable = abs(next(iter(next(iter(clauses)))))
+        for literal in (variable, -variable):
+            conditioned = condition(clauses, [literal])
+            if conditioned is not None:
+                stack.append(conditioned[0])
+    return False
+
+
+def extra_symbols(sentence, symbols):
+    """Returns how many of symbols do not occur in sentence."""
+    if symbols is None:
+        return 0
+    symbols = set(symbols)
+    missing = sentence.symbols() - symbols
+    if missing:
+        raise ValueError(f"symbols missing from model: {sorted(missing)}")
+    return len(symbols - sentence.symbols())
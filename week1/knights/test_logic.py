@@ -0,0 +1,122 @@
+import itertools
+import random
+
+from logic import (And, Biconditional, Implication, KnowledgeBase, Not, Or,
+                   Symbol, model_check, model_check_many, model_count,
+                   models)
+
+NAMES = ["A", "B", "C", "D", "E"]
+
+
+def random_sentence(rng, depth):
+    """Returns a random sentence, sometimes with empty And() and Or()."""
+    if depth == 0 or rng.random() < 0.2:
+        return Symbol(rng.choice(NAMES))
+    kind = rng.choice([Not, And, Or, Implication, Biconditional])
+    if kind is Not:
+        return Not(random_sentence(rng, depth - 1))
+    if kind in (And, Or):
+        return kind(*[random_sentence(rng, depth - 1)
+                      for _ in range(rng.randrange(4))])
+    return kind(random_sentence(rng, depth - 1),
+                random_sentence(rng, depth - 1))
+
+
+def truth_table(sentence, names):
+    """Returns every model of sentence over names, by checking them all."""
+    result = []
+    for values in itertools.product([True, False], repeat=len(names)):
+        model = dict(zip(names, values))
+        if sentence.evaluate(model):
+            result.append(model)
+    return result
+
+
+def key(model):
+    return tuple(sorted(model.items()))
+
+
+def test_models_match_truth_table():
+    rng = random.Random(0)
+    for _ in range(3000):
+        sentence = random_sentence(rng, 4)
+        names = sorted(sentence.symbols())
+        expected = sorted(map(key, truth_table(sentence, names)))
+        found = [key(model) for model in models(sentence)]
+        assert sorted(found) == expected, sentence
+        assert model_count(sentence) == len(expected), sentence
+
+
+def test_models_over_extra_symbols():
+    rng = random.Random(1)
+    for _ in range(300):
+        sentence = random_sentence(rng, 3)
+        expected = sorted(map(key, truth_table(sentence, NAMES)))
+        found = [key(model) for model in models(sentence, NAMES)]
+        assert sorted(found) == expected, sentence
+        assert model_count(sentence, NAMES) == len(expected), sentence
+
+
+def test_empty_operands():
+    C, E = Symbol("C"), Symbol("E")
+    assert list(models(Biconditional(Or(), Implication(Or(), C)))) == []
+    assert model_count(Biconditional(Or(), Implication(Or(), C))) == 0
+    assert list(models(Biconditional(Or(), Biconditional(Or(), E)))) == [
+        {"E": True}
+    ]
+    assert list(models(And(C, Not(Or())))) == [{"C": True}]
+
+
+def test_model_check_many_matches_model_check():
+    rng = random.Random(3)
+    for _ in range(1000):
+        knowledge = random_sentence(rng, 3)
+        queries = [random_sentence(rng, 2) for _ in range(4)]
+        assert model_check_many(knowledge, queries) == {
+            query: model_check(knowledge, query) for query in queries
+        }, (knowledge, queries)
+
+
+def test_knowledge_base_matches_model_check():
+    rng = random.Random(2)
+    learned = 0
+    for _ in range(300):
+        kb = KnowledgeBase()
+        told = []
+
+        # Interleave telling and asking, so later queries run on clauses
+        # learned while answering earlier ones
+        for _ in range(4):
+            sentence = random_sentence(rng, 3)
+            kb.tell(sentence)
+            told.append(sentence)
+            for _ in range(3):
+                query = random_sentence(rng, 3)
+                assert kb.ask(query) == model_check(And(*told), query), (
+                    told, query
+                )
+        learned += kb.learnts
+    assert learned > 0
+
+
+def test_knowledge_base_keeps_learned_clauses():
+    # Five pigeons do not fit in four holes, so one must be absent, which
+    # takes many conflicts to show the first time
+    pigeons = [[Symbol(f"P{p}H{h}") for h in range(4)] for p in range(5)]
+    absent = Symbol("Absent")
+    kb = KnowledgeBase(*[Or(*holes, absent) for holes in pigeons])
+    for h in range(4):
+        for p, q in itertools.combinations(range(5), 2):
+            kb.tell(Not(And(pigeons[p][h], pigeons[q][h])))
+    assert kb.ask(absent)
+    learnts = kb.learnts
+    assert learnts > 0
+
+    # The clauses learned answer the same query again without conflicts,
+    # and still hold after more is told
+    assert kb.ask(absent)
+    assert kb.learnts == learnts
+    kb.tell(pigeons[0][0])
+    assert kb.ask(absent)
+    assert not kb.ask(pigeons[1][0])
+    assert kb.ask(Not(pigeons[1][0]))
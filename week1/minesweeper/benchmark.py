@@ -0,0 +1,101 @@
+import json
+import sys
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+# Board sizes to measure, and the fraction of cells that are mines
+SIZES = [8, 16, 32, 64, 128, 256, 512, 1000]
+DENSITY = 0.15
+
+# Moves to play on each board
+MOVES = 2000
+
+
+def main():
+
+    # Check for proper usage
+    args = sys.argv[1:]
+    bitsets = args[:1] == ["bitsets"]
+    if bitsets:
+        args = args[1:]
+    if len(args) > 1:
+        sys.exit("Usage: python benchmark.py [bitsets] [results.json]")
+
+    results = []
+    print(f"{'size':>6} {'setup':>9} {'moves':>6} {'mean':>9} "
+          f"{'p50':>9} {'p99':>9} {'max':>9}")
+    for size in SIZES:
+        result = benchmark(size, size, int(size * size * DENSITY), MOVES,
+                           bitsets=bitsets)
+        results.append(result)
+        print(f"{size:>6} {seconds(result['setup']):>9} "
+              f"{result['moves']:>6} {seconds(result['mean']):>9} "
+              f"{seconds(result['p50']):>9} {seconds(result['p99']):>9} "
+              f"{seconds(result['max']):>9}")
+
+    if args:
+        with open(args[0], "w") as f:
+            json.dump(results, f, indent=4)
+
+
+def benchmark(height, width, mines, moves, seed=0, bitsets=False):
+    """
+    Plays up to `moves` moves on one board and returns the time taken to
+    set up the game and AI and the distribution of time taken per move.
+    A move is choosing a cell and updating the AI's knowledge. Hitting a
+    mine does not end the game: the AI is told about the mine instead,
+    so that every board is measured over the same number of moves.
+    With `bitsets`, the AI stores its sentences as BitSentences.
+    """
+    start = time.perf_counter()
+    game = Minesweeper(height=height, width=width, mines=mines, seed=seed)
+    ai = MinesweeperAI(height=height, width=width, mines=mines,
+                       bitsets=bitsets, seed=seed)
+    setup = time.perf_counter() - start
+
+    latencies = []
+    hits = 0
+    while len(latencies) < moves:
+        start = time.perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+            if move is None:
+                break
+        if game.is_mine(move):
+            ai.mark_mine(move)
+            hits += 1
+        else:
+            ai.add_knowledge_batch(game.reveal(move))
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return {
+        "height": height,
+        "width": width,
+        "mines": mines,
+        "bitsets": bitsets,
+        "setup": setup,
+        "moves": len(latencies),
+        "mines_hit": hits,
+        "mean": sum(latencies) / len(latencies),
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[int(len(latencies) * 0.99)],
+        "max": latencies[-1],
+    }
+
+
+def seconds(t):
+    """
+    Formats a duration in seconds with a suitable unit.
+    """
+    if t >= 1:
+        return f"{t:.2f}s"
+    if t >= 1e-3:
+        return f"{t * 1e3:.2f}ms"
+    return f"{t * 1e6:.1f}us"
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,18 @@
+import array
+import functools
 import itertools
 import random
+import time
+
+from fractions import Fraction
+
+import numpy as np
+
+# Largest group of connected cells whose mine probabilities are solved exactly
+MAX_COMPONENT_CELLS = 48
+
+# States of cells as the AI knows them
+UNKNOWN, SAFE, MINE = 0, 1, 2
 
 
 class Minesweeper:
@@ -7,31 +20,50 @@ class Minesweeper:
     Minesweeper game representation
     """
 
-    def __init__(self, height=8, width=8, mines=8):
+    def __init__(self, height=8, width=8, mines=8, seed=None):
         # Set initial width, height, and number of mines
         self.height = height
         self.width = width
         self.mines = set()
 
+        # Random number generator placing the mines
+        self.random = random.Random(seed)
+
         # Initialize an empty field with no mines
         self.board = []
         for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+            self.board.append([False] * self.width)
+
+        # Add mines randomly, sampling cells without replacement
+        for index in self.random.sample(range(height * width), mines):
+            i, j = divmod(index, width)
+            self.mines.add((i, j))
+            self.board[i][j] = True
 
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        # Count the mines around every cell at once
+        self.counts = neighbor_counts(self.board)
+
+        # Look up neighbors of cells from a table built once per board size
+        self.neighbor_table = neighbor_table(height, width)
 
         # At first, player has found no mines
         self.mines_found = set()
 
+        # Keep track of cells revealed so far
+        self.revealed = set()
+
+    @classmethod
+    def from_mines(cls, height, width, mines):
+        """
+        Returns a game with mines at exactly the given cells.
+        """
+        game = cls(height=height, width=width, mines=0)
+        for i, j in mines:
+            game.mines.add((i, j))
+            game.board[i][j] = True
+        game.counts = neighbor_counts(game.board)
+        return game
+
     def print(self):
         """
         Prints a text-based representation
@@ -57,23 +89,37 @@ class Minesweeper:
         within one row and column of a given cell,
         not including the cell itself.
         """
+        return int(self.counts[cell])
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
+    def neighbors(self, cell):
+        """
+        Returns the cells within one row and column of a given cell,
+        not including the cell itself.
+        """
+        return neighbors_of(cell, self.neighbor_table, self.width)
 
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
+    def reveal(self, cell):
+        """
+        Reveals a safe cell, and returns a dict mapping each newly revealed
+        cell to its number of nearby mines. If the cell has no nearby
+        mines, its neighbors are revealed too, and so on through the whole
+        region of cells with no nearby mines and its border.
+        """
+        revealed = dict()
+        stack = [cell]
+        while stack:
+            cell = stack.pop()
+            if cell in self.revealed:
+                continue
+            self.revealed.add(cell)
+            revealed[cell] = count = self.nearby_mines(cell)
 
-        return count
+            # Neighbors of a cell with no nearby mines are all safe
+            if count == 0:
+                for neighbor in self.neighbors(cell):
+                    if neighbor not in self.revealed:
+                        stack.append(neighbor)
+        return revealed
 
     def won(self):
         """
@@ -96,6 +142,9 @@ class Sentence:
     def __eq__(self, other):
         return self.cells == other.cells and self.count == other.count
 
+    def __hash__(self):
+        return hash((frozenset(self.cells), self.count))
+
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
@@ -137,17 +186,201 @@ class Sentence:
             # Since cell is not a mine, remove it from the set and DO NOT decrease the count of mines by 1
             self.cells.remove(cell)
 
+    def issubset(self, other):
+        """
+        Checks if every cell in self.cells is also in other.cells.
+        """
+        return self.cells <= other.cells
+
+    def difference(self, other):
+        """
+        Returns the sentence about the cells in self.cells but not in
+        other.cells, given that other.cells is a subset of self.cells.
+        """
+        return Sentence(self.cells - other.cells, self.count - other.count)
+
+    def keys(self):
+        """
+        Returns the keys of the AI's index of sentences for the cells in
+        the sentence, which are the cells themselves.
+        """
+        return self.cells
+
+
+class BitSentence:
+    """
+    Sentence whose cells are stored as bits of an integer, where cell
+    (i, j) is bit i * width + j. To keep the integer small on large
+    boards, bits are counted from the sentence's first cell, `offset`,
+    so subset tests, differences and hashing are integer operations on
+    at most a few rows' worth of bits. An AI using bit sentences indexes
+    them by linear index, so cells are only decoded into (i, j) pairs
+    when marked or when probabilities are solved for.
+    """
+
+    def __init__(self, cells, count, width):
+        self.width = width
+        self.count = count
+        self.offset = 0
+        self.mask = 0
+        indices = [i * width + j for i, j in cells]
+        if indices:
+            self.offset = min(indices)
+            for index in indices:
+                self.mask |= 1 << (index - self.offset)
+        self.normalize()
+
+    @classmethod
+    def from_mask(cls, mask, offset, count, width):
+        """
+        Returns a sentence given its mask relative to offset.
+        """
+        sentence = cls.__new__(cls)
+        sentence.width = width
+        sentence.count = count
+        sentence.mask = mask
+        sentence.offset = offset
+        sentence.normalize()
+        return sentence
+
+    def normalize(self):
+        """
+        Shifts the mask so that its lowest bit is the first cell. Called
+        after every change, so it also updates the hash and forgets the
+        decoded indices and cells.
+        """
+        if self.mask:
+            shift = (self.mask & -self.mask).bit_length() - 1
+            self.mask >>= shift
+            self.offset += shift
+        else:
+            self.offset = 0
+        self.hashed = hash((self.mask, self.offset, self.count))
+        self.indices = None
+        self.decoded = None
+
+    def keys(self):
+        """
+        Returns the linear indices of the cells in the sentence, which key
+        the AI's index of sentences.
+        """
+        if self.indices is None:
+            self.indices = []
+            mask = self.mask
+            while mask:
+                low = mask & -mask
+                self.indices.append(self.offset + low.bit_length() - 1)
+                mask ^= low
+        return self.indices
+
+    @property
+    def cells(self):
+        if self.decoded is None:
+            self.decoded = {divmod(index, self.width)
+                            for index in self.keys()}
+        return self.decoded
+
+    def __eq__(self, other):
+        return (self.hashed == other.hashed and self.mask == other.mask
+                and self.offset == other.offset and self.count == other.count)
+
+    def __hash__(self):
+        return self.hashed
+
+    def __str__(self):
+        return f"{self.cells} = {self.count}"
+
+    def known_mines(self):
+        """
+        Returns the set of all cells in self.cells known to be mines.
+        """
+        # If number of cells equals count, all cells are mines
+        if self.mask.bit_count() == self.count:
+            return self.cells
+
+    def known_safes(self):
+        """
+        Returns the set of all cells in self.cells known to be safe.
+        """
+        # If number of cells equals 0, all cells are safe
+        if self.count == 0:
+            return self.cells
+
+    def bit(self, cell):
+        """
+        Returns the bit for cell relative to offset, or 0 if cell is not
+        in the sentence.
+        """
+        index = cell[0] * self.width + cell[1] - self.offset
+        if index < 0 or not (self.mask >> index) & 1:
+            return 0
+        return 1 << index
+
+    def mark_mine(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be a mine.
+        """
+        bit = self.bit(cell)
+        if bit:
+            self.mask ^= bit
+            self.count -= 1
+            self.normalize()
+
+    def mark_safe(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be safe.
+        """
+        bit = self.bit(cell)
+        if bit:
+            self.mask ^= bit
+            self.normalize()
+
+    def issubset(self, other):
+        """
+        Checks if every cell in self.cells is also in other.cells.
+        """
+        if not self.mask:
+            return True
+        if self.offset < other.offset:
+            return False
+        return not (self.mask << (self.offset - other.offset)) & ~other.mask
+
+    def difference(self, other):
+        """
+        Returns the sentence about the cells in self.cells but not in
+        other.cells, given that other.cells is a subset of self.cells.
+        """
+        return BitSentence.from_mask(
+            self.mask & ~(other.mask << (other.offset - self.offset)),
+            self.offset, self.count - other.count, self.width
+        )
+
 
 class MinesweeperAI:
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, bitsets=False,
+                 seed=None):
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Random number generator for choosing among equally good moves,
+        # seeded apart from a game given the same seed, which would
+        # otherwise place its first mine exactly where the AI first guesses
+        self.random = random.Random(None if seed is None else f"ai:{seed}")
+
+        # Total number of mines on the board, if known
+        self.total_mines = mines
+
+        # Whether to store sentences as bitsets, indexed by linear index,
+        # rather than as sets of cells
+        self.bitsets = bitsets
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -155,8 +388,32 @@ class MinesweeperAI:
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Cells neither chosen nor known to be mines
+        self.candidates = CellPool(height, width, self.random)
+
+        # State of each cell by linear index: UNKNOWN, SAFE or MINE
+        self.states = bytearray(height * width)
+
+        # Look up neighbors of cells from a table built once per board size
+        self.neighbor_table = neighbor_table(height, width)
+
+        # Safe cells not yet chosen, most recently found last
+        self.safe_moves = []
+
+        # Set of sentences about the game known to be true
+        self.knowledge = set()
+
+        # Sentences mentioning each cell, by the keys sentences give for it
+        self.index = dict()
+
+        # Sentences whose consequences have not been inferred yet
+        self.pending = set()
+
+        # Inference rounds and time taken by each call to add_knowledge
+        self.history = []
+
+        # Solutions of each group of connected sentences, by their contents
+        self.solutions = dict()
 
     def mark_mine(self, cell):
         """
@@ -164,17 +421,68 @@ class MinesweeperAI:
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
+        self.candidates.remove(cell)
+        index = cell[0] * self.width + cell[1]
+        self.states[index] = MINE
+        key = index if self.bitsets else cell
+        for sentence in list(self.index.get(key, ())):
+            self.discard(sentence)
             sentence.mark_mine(cell)
+            self.insert(sentence)
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
+        if cell not in self.safes and cell not in self.moves_made:
+            self.safe_moves.append(cell)
         self.safes.add(cell)
-        for sentence in self.knowledge:
+        index = cell[0] * self.width + cell[1]
+        self.states[index] = SAFE
+        key = index if self.bitsets else cell
+        for sentence in list(self.index.get(key, ())):
+            self.discard(sentence)
             sentence.mark_safe(cell)
+            self.insert(sentence)
+
+    def key(self, cell):
+        """
+        Returns the key of a cell in the index of sentences: its linear
+        index if sentences are bitsets, or otherwise the cell itself.
+        """
+        if self.bitsets:
+            return cell[0] * self.width + cell[1]
+        return cell
+
+    def insert(self, sentence):
+        """
+        Adds a sentence to the knowledge base and queues it for inference.
+        Empty sentences and sentences already known are dropped.
+        Returns True if the sentence was added.
+        """
+        keys = sentence.keys()
+        if not keys or sentence in self.knowledge:
+            return False
+        self.knowledge.add(sentence)
+        for key in keys:
+            self.index.setdefault(key, set()).add(sentence)
+        self.pending.add(sentence)
+        return True
+
+    def discard(self, sentence):
+        """
+        Removes a sentence from the knowledge base. Sentences are hashed
+        by their contents, so this must happen before a sentence changes.
+        """
+        self.knowledge.discard(sentence)
+        self.pending.discard(sentence)
+        for key in sentence.keys():
+            sentences = self.index.get(key)
+            if sentences is not None:
+                sentences.discard(sentence)
+                if not sentences:
+                    del self.index[key]
 
     def add_knowledge(self, cell, count):
         """
@@ -192,64 +500,134 @@ class MinesweeperAI:
                if they can be inferred from existing knowledge
         """
 
-        # Mark cell as move that has been made
-        self.moves_made.add(cell)
+        self.add_knowledge_batch({cell: count})
 
-        # Mark cell as safe
-        self.safes.add(cell)
+    def add_knowledge_batch(self, counts):
+        """
+        Adds knowledge about many safe cells at once, given a dict mapping
+        each cell to its number of neighboring mines, such as the region
+        uncovered by `Minesweeper.reveal`. All cells are marked before any
+        sentence is added, so sentences leave out cells revealed in the
+        same batch, and inference runs once for the whole batch.
+        """
+
+        start = time.perf_counter()
+
+        # Mark cells as moves that have been made, and as safe
+        for cell in counts:
+            self.moves_made.add(cell)
+            self.candidates.remove(cell)
+            self.mark_safe(cell)
+
+        # Add new sentences to knowledge base
+        for cell, count in counts.items():
+            self.insert(self.sentence_for(cell, count))
+
+        # Draw conclusions until nothing more can be inferred
+        rounds = self.infer()
+
+        self.history.append({
+            "cells": len(counts),
+            "rounds": rounds,
+            "seconds": time.perf_counter() - start,
+        })
+
+    def sentence_for(self, cell, count):
+        """
+        Returns a sentence saying that `count` of the neighbors of `cell`
+        whose state is still unknown are mines.
+        """
 
-        # Add new sentence to knowledge base
-        # Get all neighbors of cell
+        # Build bitsets straight from the linear indices of the neighbors
+        if self.bitsets:
+            indices = []
+            row = self.neighbor_table[cell[0] * self.width + cell[1]]
+            for index in row.tolist():
+                if index < 0:
+                    continue
+                state = self.states[index]
+                if state == MINE:
+                    count -= 1
+                elif state == UNKNOWN:
+                    indices.append(index)
+            offset = min(indices, default=0)
+            mask = 0
+            for index in indices:
+                mask |= 1 << (index - offset)
+            return BitSentence.from_mask(mask, offset, count, self.width)
+
+        # Get all neighbors of cell whose state is still unknown
         neighbors = set()
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-                # If cell is in bounds
-                if i >= 0 and j >= 0 and i < self.height and j < self.width:
-                    # If cell is not already a move that has been made or a mine, add it to neighbors
-                    if (i, j) not in self.moves_made and (i, j) not in self.mines:
-                        neighbors.add((i, j))
-                    # If cell is a mine, decrease count by 1
-                    if (i, j) in self.mines:
-                        count -= 1
-
-        # Add new sentence to knowledge base
-        self.knowledge.append(Sentence(neighbors, count))
-
-        # Mark additional cells as safe or mines
-        # Iterate through sentences
-        for sentence in self.knowledge:
+        for neighbor in neighbors_of(cell, self.neighbor_table, self.width):
+            # If cell is a mine, decrease count by 1
+            if neighbor in self.mines:
+                count -= 1
+            # If cell is not known to be safe, add it to neighbors
+            elif neighbor not in self.safes:
+                neighbors.add(neighbor)
+
+        return Sentence(neighbors, count)
+
+    def infer(self):
+        """
+        Repeats rounds of inference until no sentence is left pending,
+        so conclusions that build on each other are all drawn in one move.
+        Returns the number of rounds taken.
+        """
+        rounds = 0
+        while self.pending:
+            self.infer_round()
+            rounds += 1
+        return rounds
+
+    def infer_round(self):
+        """
+        Marks cells as safe or mines, and adds sentences inferred with
+        the subset method, looking only at sentences that changed since
+        they were last examined and at sentences sharing cells with them.
+        """
+
+        # Take the sentences queued so far, leaving later changes queued
+        pending, self.pending = self.pending, set()
+
+        self.mark_known(pending)
+        self.infer_subsets(pending)
+
+    def mark_known(self, sentences):
+        """
+        Marks cells as safe or mines where any of `sentences` determines
+        them.
+        """
+        for sentence in sentences:
+            if sentence not in self.knowledge:
+                continue
             # For each safe cell in the sentence, mark it as safe
-            if not sentence.known_safes() is None:
-                for safe_cell in list(sentence.known_safes()):
-                    self.mark_safe(safe_cell)
+            for safe_cell in list(sentence.known_safes() or ()):
+                self.mark_safe(safe_cell)
             # For each mine in the sentence, mark it as a mine
-            if not sentence.known_mines() is None:
-                for mine_cell in list(sentence.known_mines()):
-                    self.mark_mine(mine_cell)
-
-        # Add any new sentences to the AI's knowledge base if they can be inferred from existing knowledge based on subset method
-
-        # Create list to hold new sentences
-        new_sentences = []
-
-        # Iterate through sentences
-        for super_sentence in self.knowledge:
-            # Iterate through sentences again
-            for sub_sentence in self.knowledge:
-                # Check if sub_sentence is a subset of super_sentence
-                if sub_sentence.cells.issubset(super_sentence.cells):
-                    # Create a new sentence with the difference of the two sentences
-                    new_sentence = Sentence(
-                        super_sentence.cells - sub_sentence.cells,
-                        super_sentence.count - sub_sentence.count,
-                    )
-                    # Check if new sentence is not already in knowledge base
-                    if new_sentence not in self.knowledge:
-                        # Add new sentence to knowledge base
-                        new_sentences.append(new_sentence)
+            for mine_cell in list(sentence.known_mines() or ()):
+                self.mark_mine(mine_cell)
 
-        # Add new sentences to knowledge base
-        self.knowledge.extend(new_sentences)
+    def infer_subsets(self, sentences):
+        """
+        Adds sentences inferred with the subset method from each of
+        `sentences` and the sentences sharing a cell with it.
+        """
+        for sentence in sentences:
+            if sentence not in self.knowledge:
+                continue
+            related = set()
+            for key in sentence.keys():
+                related.update(self.index.get(key, ()))
+            for other in related:
+                subset = sentence.issubset(other)
+                superset = other.issubset(sentence)
+                # Sentence is a subset of the other
+                if subset and not superset:
+                    self.insert(other.difference(sentence))
+                # The other is a subset of sentence
+                elif superset and not subset:
+                    self.insert(sentence.difference(other))
 
     def make_safe_move(self):
         """
@@ -260,37 +638,417 @@ class MinesweeperAI:
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        # Create a copy of list of safe cells
-        safe_list = list(self.safes)
-
-        # Iterate through list of safe cells
-        for i in range(len(safe_list)):
-            # If cell is not already a move that has been made, return it
-            safe_cell = list(safe_list)[i]
-            if safe_cell not in self.moves_made:
-                return safe_cell
+        # Drop safe cells that have been chosen since they were found
+        while self.safe_moves and self.safe_moves[-1] in self.moves_made:
+            self.safe_moves.pop()
 
+        if self.safe_moves:
+            return self.safe_moves[-1]
         return None
 
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
-        Should choose randomly among cells that:
+        Should choose among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        picking at random among the cells least likely to be a mine.
+        Returns None if every such cell must be a mine.
         """
 
-        possible_moves = set()
-        # Iterate through all cells
-        for i in range(self.height):
-            for j in range(self.width):
-                # If cell is not already a move that has been made or a known mine, add it to possible moves
-                if (i, j) not in self.moves_made and (i, j) not in self.mines:
-                    possible_moves.add((i, j))
-
         # If there are no possible moves, return None
-        if len(possible_moves) == 0:
+        if not self.candidates:
             return None
-        else:
-            # Otherwise, return a random move
-            return random.choice(list(possible_moves))
+
+        # Known safe cells carry no risk at all
+        move = self.make_safe_move()
+        if move is not None:
+            return move
+
+        # Find the least risky cells in sentences, never choosing a cell
+        # that must be a mine
+        probabilities, other = self.risk()
+        probabilities = {
+            cell: p for cell, p in probabilities.items() if p < 1
+        }
+        if other is not None and other >= 1:
+            other = None
+        if not probabilities and other is None:
+            return None
+        lowest = min(probabilities.values(), default=None)
+        least_risky = sorted(
+            cell for cell in probabilities if probabilities[cell] == lowest
+        )
+
+        # Cells in no sentence are as risky as each other
+        if other is not None and (
+            lowest is None or other < lowest or (
+                other == lowest and self.random.randrange(
+                    self.unconstrained() + len(least_risky)
+                ) < self.unconstrained()
+            )
+        ):
+            return self.random_unconstrained()
+        return self.random.choice(least_risky)
+
+    def unconstrained(self):
+        """
+        Returns the number of cells that could be chosen but are in no
+        sentence and not known to be safe.
+        """
+        unmoved_safes = len(self.safes) - len(self.moves_made)
+        return len(self.candidates) - len(self.index) - unmoved_safes
+
+    def random_unconstrained(self):
+        """
+        Returns a random cell that could be chosen but is in no sentence
+        and not known to be safe.
+        """
+        # Such cells are usually most of the board, so sample until one is
+        for _ in range(100):
+            cell = self.candidates.choice()
+            if self.key(cell) not in self.index and cell not in self.safes:
+                return cell
+        return self.random.choice([
+            cell for cell in self.candidates
+            if self.key(cell) not in self.index and cell not in self.safes
+        ])
+
+    def mine_probabilities(self, cells):
+        """
+        Returns the probability, as a Fraction, that each of the given
+        cells is a mine, as computed by `risk`.
+        """
+        probabilities, other = self.risk()
+        return {
+            cell: Fraction(0) if cell in self.safes
+            else probabilities.get(cell, other)
+            for cell in cells
+        }
+
+    def risk(self):
+        """
+        Returns the probability that each cell in a sentence is a mine,
+        and the probability shared by every other unknown cell (None if
+        there are no such cells).
+
+        Probabilities are exact, assuming every placement of mines
+        consistent with the knowledge base is equally likely. If the total
+        number of mines is known, placements must also use exactly that
+        many mines. Groups of connected sentences with more than
+        MAX_COMPONENT_CELLS cells are instead estimated from the densest
+        sentence containing each cell, and other cells from the mines
+        left over.
+        """
+        probabilities = dict()
+
+        # Solve each group of sentences that share cells separately,
+        # reusing solutions of groups unchanged since the last call
+        solutions = dict()
+        approximate = []
+        for component in self.components():
+            key = frozenset(
+                (frozenset(sentence.cells), sentence.count)
+                for sentence in component
+            )
+            if len(set().union(*(cells for cells, _ in key))) > (
+                MAX_COMPONENT_CELLS
+            ):
+                approximate.append(key)
+            elif key in self.solutions:
+                solutions[key] = self.solutions[key]
+            else:
+                solutions[key] = self.solve_component(component)
+        self.solutions = solutions
+        components = list(solutions.values())
+        unconstrained = self.unconstrained()
+
+        # Count solutions of all groups together by number of mines, and
+        # of the groups before and after each one
+        before = [{0: 1}]
+        for counts, _ in components:
+            before.append(convolve([before[-1], counts]))
+        after = [{0: 1}]
+        for counts, _ in reversed(components):
+            after.append(convolve([after[-1], counts]))
+        after.reverse()
+        total = before[-1]
+        most = max(total)
+
+        # Weight each number of frontier mines by the ways to place the
+        # remaining mines elsewhere, if every group is solved exactly
+        remaining = None
+        if self.total_mines is not None and not approximate:
+            remaining = self.total_mines - len(self.mines)
+            weights = placement_weights(unconstrained, remaining, most)
+            if not any(total[k] * weights[k] for k in total):
+                remaining = None
+        if remaining is None:
+            weights = [1] * (most + 1)
+
+        # Probability of each cell in a group is its share of the weighted
+        # solutions of that group combined with those of every other group
+        for j, (counts, mine_counts) in enumerate(components):
+            rest = convolve([before[j], after[j + 1]])
+            group_weights = {
+                k: sum(rest[t] * weights[k + t] for t in rest) for k in counts
+            }
+            denominator = sum(counts[k] * group_weights[k] for k in counts)
+            for k in mine_counts:
+                for cell, count in mine_counts[k].items():
+                    probabilities[cell] = (probabilities.get(cell, 0)
+                                           + count * group_weights[k])
+            for cell in set().union(*mine_counts.values()):
+                probabilities[cell] = Fraction(probabilities[cell],
+                                               denominator)
+
+        # Estimate groups too large to solve from their densest sentence
+        for key in approximate:
+            for cells, count in key:
+                probability = Fraction(count, len(cells))
+                for cell in cells:
+                    probabilities[cell] = max(
+                        probabilities.get(cell, probability), probability
+                    )
+
+        # Cells outside every sentence share the remaining mines evenly
+        other = None
+        if unconstrained > 0:
+            if remaining is not None:
+                other = Fraction(
+                    sum(total[k] * weights[k] * (remaining - k)
+                        for k in total),
+                    unconstrained * sum(total[k] * weights[k] for k in total),
+                )
+            elif self.total_mines is not None:
+                expected = (self.total_mines - len(self.mines)
+                            - sum(probabilities.values()))
+                other = Fraction(min(max(expected, 0), unconstrained),
+                                 unconstrained)
+            else:
+                other = Fraction(1, 2)
+        return probabilities, other
+
+    def components(self):
+        """
+        Returns the sentences of the knowledge base grouped so that
+        sentences in different groups share no cells.
+        """
+        components = []
+        seen = set()
+        for sentence in self.knowledge:
+            if sentence in seen:
+                continue
+            seen.add(sentence)
+            component = []
+            stack = [sentence]
+            while stack:
+                current = stack.pop()
+                component.append(current)
+                for key in current.keys():
+                    for other in self.index[key]:
+                        if other not in seen:
+                            seen.add(other)
+                            stack.append(other)
+            components.append(component)
+        return components
+
+    def solve_component(self, sentences):
+        """
+        Enumerates placements of mines in the cells of connected sentences
+        that satisfy all of them, by backtracking one cell at a time.
+        Returns two dicts keyed by number of mines placed: the number of
+        placements, and for each cell the number of placements in which
+        it is a mine.
+        """
+        # Order cells so that each sentence is completed as early as possible
+        cells = []
+        for sentence in sorted(sentences, key=lambda s: len(s.cells)):
+            for cell in sorted(sentence.cells):
+                if cell not in cells:
+                    cells.append(cell)
+        constraints = {cell: [] for cell in cells}
+        mines = []
+        unassigned = []
+        for i, sentence in enumerate(sentences):
+            mines.append(0)
+            unassigned.append(len(sentence.cells))
+            for cell in sentence.cells:
+                constraints[cell].append(i)
+
+        counts = dict()
+        mine_counts = dict()
+        placed = []
+
+        def backtrack(index):
+            if index == len(cells):
+                k = len(placed)
+                counts[k] = counts.get(k, 0) + 1
+                cell_counts = mine_counts.setdefault(k, dict())
+                for cell in placed:
+                    cell_counts[cell] = cell_counts.get(cell, 0) + 1
+                return
+            cell = cells[index]
+            for mine in (True, False):
+
+                # Check each sentence can still be satisfied
+                feasible = True
+                for i in constraints[cell]:
+                    unassigned[i] -= 1
+                    mines[i] += mine
+                    if not (mines[i] <= sentences[i].count
+                            <= mines[i] + unassigned[i]):
+                        feasible = False
+                if feasible:
+                    if mine:
+                        placed.append(cell)
+                    backtrack(index + 1)
+                    if mine:
+                        placed.pop()
+                for i in constraints[cell]:
+                    unassigned[i] += 1
+                    mines[i] -= mine
+
+        backtrack(0)
+
+        # Make sure every cell is listed, even if it is never a mine
+        for k in mine_counts:
+            for cell in cells:
+                mine_counts[k].setdefault(cell, 0)
+        return counts, mine_counts
+
+
+def convolve(distributions):
+    """
+    Combines counts of solutions by number of mines for independent
+    groups of cells into counts for all of them together.
+    """
+    total = {0: 1}
+    for counts in distributions:
+        combined = dict()
+        for i in total:
+            for j in counts:
+                combined[i + j] = combined.get(i + j, 0) + total[i] * counts[j]
+        total = combined
+    return total
+
+
+def placement_weights(n, r, most):
+    """
+    Returns a list whose k-th entry, for k from 0 to most, is proportional
+    to the number of ways to choose r - k of n cells to be mines. Entries
+    are built from the ratio between consecutive binomial coefficients,
+    which avoids computing the coefficients themselves: on large boards
+    they have hundreds of thousands of digits.
+    """
+    weights = [0] * (most + 1)
+    low, high = max(0, r - n), min(most, r)
+    if low > high:
+        return weights
+
+    # Entry k is the product of (r - i) for low <= i < k
+    # and of (n - r + i) for k < i <= high
+    suffix = [1] * (high - low + 1)
+    for k in range(high - 1, low - 1, -1):
+        suffix[k - low] = suffix[k - low + 1] * (n - r + k + 1)
+    prefix = 1
+    for k in range(low, high + 1):
+        weights[k] = prefix * suffix[k - low]
+        prefix *= r - k
+    return weights
+
+
+@functools.lru_cache(maxsize=4)
+def neighbor_table(height, width):
+    """
+    Returns an array with a row for each cell of a board, by linear
+    index i * width + j, listing the linear indices of the cells within
+    one row and column of it. Missing neighbors past the edge of the board
+    are -1. Tables are cached, so boards of the same size share one.
+    """
+    indices = np.arange(height * width, dtype=np.int32).reshape(height, width)
+    padded = np.pad(indices, 1, constant_values=-1)
+    columns = []
+    for di in (-1, 0, 1):
+        for dj in (-1, 0, 1):
+            if di or dj:
+                columns.append(
+                    padded[1 + di:1 + di + height, 1 + dj:1 + dj + width]
+                )
+    table = np.stack(columns, axis=-1).reshape(height * width, 8)
+    table.flags.writeable = False
+    return table
+
+
+def neighbors_of(cell, table, width):
+    """
+    Returns the cells within one row and column of a given cell,
+    not including the cell itself, using a board's neighbor table.
+    """
+    row = table[cell[0] * width + cell[1]]
+    return [divmod(index, width) for index in row.tolist() if index >= 0]
+
+
+def neighbor_counts(board):
+    """
+    Returns an array with the number of mines within one row and column
+    of each cell of a board, not including the cell itself. This is a
+    convolution of the board with a 3x3 kernel of ones minus its centre,
+    computed by summing shifted copies of the board.
+    """
+    mines = np.array(board, dtype=np.uint8).reshape(len(board), -1)
+    height, width = mines.shape
+    padded = np.pad(mines, 1)
+    counts = np.zeros((height, width), dtype=np.uint8)
+    for di in (-1, 0, 1):
+        for dj in (-1, 0, 1):
+            if di or dj:
+                counts += padded[1 + di:1 + di + height, 1 + dj:1 + dj + width]
+    return counts
+
+
+class CellPool:
+    """
+    Set of board cells, stored as linear indices in an array alongside
+    each index's position in it, so that removing a cell and choosing a
+    random cell both take constant time.
+    """
+
+    def __init__(self, height, width, random=random):
+        self.width = width
+        self.random = random
+        self.size = height * width
+        self.indices = array.array("q", range(self.size))
+        self.positions = array.array("q", range(self.size))
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, cell):
+        return self.positions[cell[0] * self.width + cell[1]] < self.size
+
+    def __iter__(self):
+        for position in range(self.size):
+            yield divmod(self.indices[position], self.width)
+
+    def remove(self, cell):
+        """
+        Removes a cell, if present, by swapping it with the last cell.
+        """
+        index = cell[0] * self.width + cell[1]
+        position = self.positions[index]
+        if position >= self.size:
+            return
+        self.size -= 1
+        last = self.indices[self.size]
+        self.indices[position] = last
+        self.positions[last] = position
+        self.indices[self.size] = index
+        self.positions[index] = self.size
+
+    def choice(self):
+        """
+        Returns a cell chosen uniformly at random.
+        """
+        index = self.indices[self.random.randrange(self.size)]
+        return divmod(index, self.width)
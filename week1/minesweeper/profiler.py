@@ -0,0 +1,132 @@
+import collections
+import json
+import time
+
+# Methods of MinesweeperAI timed by the profiler, and the phase each is
+# reported as. Phases nest: time spent marking cells during inference
+# counts towards both "infer" and "mark_safe" or "mark_mine".
+PHASES = {
+    "add_knowledge_batch": "add_knowledge",
+    "sentence_for": "neighbors",
+    "infer": "infer",
+    "mark_known": "mark_known",
+    "mark_safe": "mark_safe",
+    "mark_mine": "mark_mine",
+    "infer_subsets": "subsets",
+    "risk": "risk",
+}
+
+
+class Profiler:
+    """
+    Records how many times each phase of a MinesweeperAI's work runs and
+    how long it takes, and the size of its knowledge base after each
+    update. A profiler works by replacing the AI's methods with timed
+    wrappers on that one AI, so an AI without a profiler runs exactly as
+    before and pays nothing for it.
+    """
+
+    def __init__(self, events=True):
+        # Whether to keep every call as a trace event, or only totals
+        self.events = events
+
+        # Number of calls and total seconds spent in each phase
+        self.calls = collections.Counter()
+        self.seconds = collections.Counter()
+
+        # Trace events, as in the Chrome trace event format
+        self.trace = []
+
+        # Number of sentences and cells known after each update
+        self.sizes = []
+
+        self.start = time.perf_counter()
+
+    def attach(self, ai):
+        """
+        Starts profiling `ai`. Returns `ai`.
+        """
+        for method, phase in PHASES.items():
+            setattr(ai, method, self.wrap(phase, getattr(ai, method)))
+
+        # Record the size of the knowledge base after every update
+        update = ai.add_knowledge_batch
+
+        def add_knowledge_batch(counts):
+            update(counts)
+            self.record_size(ai)
+
+        ai.add_knowledge_batch = add_knowledge_batch
+        return ai
+
+    def wrap(self, phase, method):
+        """
+        Returns a function calling `method` and recording its time under
+        `phase`.
+        """
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                self.calls[phase] += 1
+                self.seconds[phase] += end - start
+                if self.events:
+                    self.trace.append({
+                        "name": phase,
+                        "ph": "X",
+                        "ts": self.microseconds(start),
+                        "dur": (end - start) * 1e6,
+                        "pid": 0,
+                        "tid": 0,
+                    })
+        return timed
+
+    def record_size(self, ai):
+        """
+        Records the size of `ai`'s knowledge base.
+        """
+        size = {
+            "sentences": len(ai.knowledge),
+            "cells": len(ai.index),
+            "mines": len(ai.mines),
+            "safes": len(ai.safes),
+        }
+        self.sizes.append(size)
+        self.trace.append({
+            "name": "knowledge",
+            "ph": "C",
+            "ts": self.microseconds(time.perf_counter()),
+            "pid": 0,
+            "args": size,
+        })
+
+    def microseconds(self, t):
+        """
+        Returns the time `t` in microseconds since the profiler started.
+        """
+        return (t - self.start) * 1e6
+
+    def summary(self):
+        """
+        Returns the number of calls and total seconds for each phase.
+        """
+        return {
+            phase: {"calls": self.calls[phase],
+                    "seconds": self.seconds[phase]}
+            for phase in PHASES.values() if self.calls[phase]
+        }
+
+    def export(self, path):
+        """
+        Writes the trace to `path` as JSON in the Chrome trace event
+        format, which chrome://tracing and Perfetto can open, with the
+        per-phase summary alongside.
+        """
+        with open(path, "w") as f:
+            json.dump({
+                "traceEvents": self.trace,
+                "displayTimeUnit": "ms",
+                "summary": self.summary(),
+            }, f)
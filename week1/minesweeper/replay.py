@@ -0,0 +1,126 @@
+import json
+import sys
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI
+from profiler import Profiler
+
+# Version of the move log format written by `record`
+VERSION = 1
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) == 7 and sys.argv[1] == "record":
+        height, width, mines, seed = (int(arg) for arg in sys.argv[2:6])
+        log = record(height, width, mines, seed)
+        with open(sys.argv[6], "w") as f:
+            json.dump(log, f)
+        print(f"{log['result']} after {len(log['moves'])} moves")
+    elif len(sys.argv) == 3 and sys.argv[1] == "play":
+        with open(sys.argv[2]) as f:
+            log = json.load(f)
+        start = time.perf_counter()
+        result = replay(log)
+        elapsed = time.perf_counter() - start
+        print(f"{result} after {len(log['moves'])} moves "
+              f"in {elapsed * 1e3:.2f}ms")
+        if result != log["result"]:
+            sys.exit(f"Replay ended in a {result}, "
+                     f"but the log recorded a {log['result']}")
+    elif len(sys.argv) == 4 and sys.argv[1] == "profile":
+        with open(sys.argv[2]) as f:
+            log = json.load(f)
+        profiler = Profiler()
+        replay(log, profiler)
+        profiler.export(sys.argv[3])
+        print(f"{'phase':<14} {'calls':>8} {'seconds':>10}")
+        for phase, totals in profiler.summary().items():
+            print(f"{phase:<14} {totals['calls']:>8} "
+                  f"{totals['seconds']:>10.4f}")
+        print(f"{profiler.sizes[-1]['sentences'] if profiler.sizes else 0} "
+              f"sentences known at the end")
+    else:
+        sys.exit("Usage: python replay.py record height width mines seed "
+                 "log.json\n       python replay.py play log.json"
+                 "\n       python replay.py profile log.json trace.json")
+
+
+def record(height, width, mines, seed):
+    """
+    Plays one game without a display, seeding the game and the AI with
+    `seed`, and returns a log from which the game can be replayed exactly.
+
+    Cells in the log are linear indices, `i * width + j`, so a log holds
+    only the board's size, the positions of its mines, the moves made in
+    order, and whether the game ended in a "win" or a "loss".
+    """
+    game = Minesweeper(height=height, width=width, mines=mines, seed=seed)
+    ai = MinesweeperAI(height=height, width=width, mines=mines, seed=seed)
+
+    moves = []
+    result = play(game, ai, moves.append)
+    return {
+        "version": VERSION,
+        "height": height,
+        "width": width,
+        "seed": seed,
+        "mines": sorted(i * width + j for i, j in game.mines),
+        "moves": [i * width + j for i, j in moves],
+        "result": result,
+    }
+
+
+def replay(log, profiler=None):
+    """
+    Rebuilds the board described by `log` and reveals its recorded moves,
+    in order, to a fresh AI, profiled by `profiler` if given. Returns
+    "win" or "loss".
+    """
+    if log.get("version") != VERSION:
+        raise ValueError(f"unsupported move log version: {log.get('version')}")
+    height, width = log["height"], log["width"]
+    game = Minesweeper.from_mines(
+        height, width, [divmod(index, width) for index in log["mines"]]
+    )
+    ai = MinesweeperAI(height=height, width=width, mines=len(log["mines"]))
+    if profiler is not None:
+        profiler.attach(ai)
+
+    result = "win"
+    for index in log["moves"]:
+        move = divmod(index, width)
+        if game.is_mine(move):
+            result = "loss"
+            break
+        ai.add_knowledge_batch(game.reveal(move))
+    return result
+
+
+def play(game, ai, on_move):
+    """
+    Lets `ai` play `game` to the end, calling `on_move` with every move it
+    makes. Returns "win" or "loss".
+    """
+    safe_cells = game.height * game.width - len(game.mines)
+    while True:
+        # Once every safe cell is revealed the game is won, even if the AI
+        # has not deduced where all the mines are
+        if len(game.revealed) == safe_cells:
+            return "win"
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+
+            # With no moves left, every safe cell has been revealed
+            if move is None:
+                return "win"
+        on_move(move)
+        if game.is_mine(move):
+            return "loss"
+        ai.add_knowledge_batch(game.reveal(move))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import json
+import multiprocessing
+import sys
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) not in [5, 6]:
+        sys.exit("Usage: python simulate.py games height width mines "
+                 "[report.json]")
+    games, height, width, mines = (int(arg) for arg in sys.argv[1:5])
+
+    start = time.perf_counter()
+    with multiprocessing.Pool() as pool:
+        results = pool.starmap(
+            play, [(seed, height, width, mines) for seed in range(games)],
+            chunksize=max(1, games // (4 * multiprocessing.cpu_count()))
+        )
+    report = summarize(results)
+    report["seconds"] = time.perf_counter() - start
+
+    # Write report to file if given, or print it otherwise
+    if len(sys.argv) == 6:
+        with open(sys.argv[5], "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+
+
+def play(seed, height, width, mines):
+    """
+    Plays one game without a display, seeding the game's and the AI's
+    random number generators with `seed`. Returns whether the AI won, how
+    many moves it made, how many of them were random guesses, and how
+    long each update of its knowledge took.
+    """
+    game = Minesweeper(height=height, width=width, mines=mines, seed=seed)
+    ai = MinesweeperAI(height=height, width=width, mines=mines, seed=seed)
+
+    moves = 0
+    guesses = 0
+    won = False
+    safe_cells = height * width - mines
+    while True:
+        # Once every safe cell is revealed the game is won, even if the AI
+        # has not deduced where all the mines are
+        if len(game.revealed) == safe_cells:
+            won = True
+            break
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+
+            # With no moves left, every safe cell has been revealed
+            if move is None:
+                won = True
+                break
+            guesses += 1
+        moves += 1
+        if game.is_mine(move):
+            break
+        ai.add_knowledge_batch(game.reveal(move))
+
+    return {
+        "seed": seed,
+        "won": won,
+        "moves": moves,
+        "guesses": guesses,
+        "add_knowledge": [entry["seconds"] for entry in ai.history],
+    }
+
+
+def summarize(results):
+    """
+    Aggregates the results of many games into a report.
+    """
+    games = len(results)
+    times = sorted(t for result in results for t in result["add_knowledge"])
+    report = {
+        "games": games,
+        "wins": sum(result["won"] for result in results),
+        "win_rate": sum(result["won"] for result in results) / games,
+        "moves_per_game": sum(result["moves"] for result in results) / games,
+        "guesses_per_game": (
+            sum(result["guesses"] for result in results) / games
+        ),
+        "add_knowledge": {"calls": len(times)},
+    }
+    if times:
+        report["add_knowledge"].update({
+            "mean": sum(times) / len(times),
+            "p50": times[len(times) // 2],
+            "p99": times[int(len(times) * 0.99)],
+            "max": times[-1],
+        })
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import csv
+import json
+import multiprocessing
+import os
+import sys
+
+from elimination import marginals
+from heredity import load_pedigree
+
+# Columns of each output row, one row per person
+FIELDS = ["family", "name", "gene_2", "gene_1", "gene_0", "trait"]
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) != 3 or not sys.argv[2].endswith((".jsonl", ".csv")):
+        sys.exit("Usage: python batch.py directory|- output.jsonl|output.csv")
+    paths = family_paths(sys.argv[1])
+
+    # Families that cannot be scored are reported and left out
+    with multiprocessing.Pool() as pool, \
+            open(sys.argv[2], "w", newline="") as f:
+        write = writer(f, sys.argv[2])
+        families = skipped = 0
+        for path, rows, error in pool.imap(score, paths, chunksize=16):
+            if error is not None:
+                print(f"Skipped {path}: {error}", file=sys.stderr)
+                skipped += 1
+                continue
+            for row in rows:
+                write(row)
+            families += 1
+    print(f"Scored {families} families, skipped {skipped}")
+
+
+def family_paths(source):
+    """
+    Generate the paths of the family CSV files in directory `source`, in
+    order of name, or if `source` is "-", the paths read from standard
+    input, one per line, as they arrive.
+    """
+    if source == "-":
+        for line in sys.stdin:
+            if line.strip():
+                yield line.strip()
+    else:
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".csv"):
+                yield os.path.join(source, name)
+
+
+def score(path):
+    """
+    Returns `path`, an output row for each person in the family at
+    `path` with their probability of each gene count and of having the
+    trait, and None; or if the family cannot be read or is not a valid
+    pedigree, `path`, None and the reason.
+    """
+    try:
+        probabilities = marginals(load_pedigree(path))
+    except (OSError, ValueError, KeyError, csv.Error) as e:
+        return path, None, f"{type(e).__name__}: {e}"
+    rows = [
+        {
+            "family": path,
+            "name": name,
+            "gene_2": distributions["gene"][2],
+            "gene_1": distributions["gene"][1],
+            "gene_0": distributions["gene"][0],
+            "trait": distributions["trait"][True],
+        }
+        for name, distributions in probabilities.items()
+    ]
+    return path, rows, None
+
+
+def writer(f, filename):
+    """
+    Returns a function writing a row to `f`, as a line of JSON if
+    `filename` ends in .jsonl, or as CSV with a header otherwise.
+    """
+    if filename.endswith(".jsonl"):
+        return lambda row: f.write(json.dumps(row) + "\n")
+    output = csv.DictWriter(f, fieldnames=FIELDS)
+    output.writeheader()
+    return output.writerow
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import itertools
+import sys
+
+from heredity import (INHERITANCE, PRIOR, TRAIT, compiled, load_pedigree,
+                      print_probabilities)
+
+# Possible numbers of copies of the gene
+GENES = (0, 1, 2)
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python elimination.py data.csv")
+    people = load_pedigree(sys.argv[1])
+
+    print_probabilities(marginals(people))
+
+
+class Factor:
+    """
+    Table of nonnegative numbers, one for each assignment of gene counts
+    to a tuple of people.
+    """
+
+    def __init__(self, variables, table):
+        self.variables = tuple(variables)
+        self.table = table
+
+    def __repr__(self):
+        return f"Factor({self.variables})"
+
+    def multiply(self, other):
+        """
+        Returns the product of this factor and `other`, over the people in
+        either.
+        """
+        variables = self.variables + tuple(
+            v for v in other.variables if v not in self.variables
+        )
+        position = {v: i for i, v in enumerate(variables)}
+        mine = [position[v] for v in self.variables]
+        theirs = [position[v] for v in other.variables]
+        table = dict()
+        for assignment in itertools.product(GENES, repeat=len(variables)):
+            table[assignment] = (
+                self.table[tuple(assignment[i] for i in mine)] *
+                other.table[tuple(assignment[i] for i in theirs)]
+            )
+        return Factor(variables, table)
+
+    def sum_out(self, variable):
+        """
+        Returns this factor with `variable` summed out.
+        """
+        i = self.variables.index(variable)
+        table = dict()
+        for assignment, p in self.table.items():
+            rest = assignment[:i] + assignment[i + 1:]
+            table[rest] = table.get(rest, 0) + p
+        return Factor(self.variables[:i] + self.variables[i + 1:], table)
+
+    def scaled(self):
+        """
+        Returns this factor divided by its largest entry, which leaves the
+        distributions it implies unchanged but stops products of many
+        factors from underflowing to 0.
+        """
+        largest = max(self.table.values())
+        if largest == 0:
+            return self
+        return Factor(self.variables, {
+            assignment: p / largest for assignment, p in self.table.items()
+        })
+
+
+def factors(pedigree, inheritance=None):
+    """
+    Returns the factors of the pedigree's Bayesian network with all trait
+    variables removed: each person's gene count given their parents', and
+    for each person whose trait is known, the likelihood of that trait
+    given their gene count. Unknown traits sum to 1 and drop out.
+    People are identified by their ids in `pedigree`.
+
+    Children's factors share `inheritance`, by default the table built
+    once in heredity.py.
+    """
+    if inheritance is None:
+        inheritance = INHERITANCE
+    result = []
+    for person in range(len(pedigree)):
+        result.append(gene_factor(pedigree, person, inheritance))
+
+        # Evidence about the trait
+        trait = pedigree.traits[person]
+        if trait is not None:
+            result.append(trait_factor(person, trait))
+    return result
+
+
+def gene_factor(pedigree, person, inheritance):
+    """
+    Returns the factor for `person`'s gene count given their parents'.
+    """
+    mother = pedigree.mothers[person]
+    father = pedigree.fathers[person]
+
+    # Gene count of people without parents in the data
+    if mother < 0:
+        return Factor((person,), {(g,): PRIOR[g] for g in GENES})
+
+    # Gene count inherited from each parent
+    return Factor((person, mother, father), inheritance)
+
+
+def trait_factor(person, trait):
+    """
+    Returns the likelihood of `person` having `trait` given their gene
+    count.
+    """
+    return Factor((person,), {(g,): TRAIT[g, trait] for g in GENES})
+
+
+def elimination_order(factors):
+    """
+    Returns an order in which to eliminate the people in `factors`,
+    greedily choosing next whoever is linked to the fewest others, where
+    two people are linked if they share a factor or an earlier step
+    linked them. The largest factor built while eliminating in this
+    order stays small for pedigrees that are close to trees.
+    """
+    links = dict()
+    for factor in factors:
+        for v in factor.variables:
+            links.setdefault(v, set()).update(factor.variables)
+    for v in links:
+        links[v].discard(v)
+
+    order = []
+    while links:
+        variable = min(links, key=lambda v: len(links[v]))
+        order.append(variable)
+
+        # Eliminating a person links everyone they were linked to
+        neighbors = links.pop(variable)
+        for v in neighbors:
+            links[v].discard(variable)
+            links[v].update(neighbors - {v})
+    return order
+
+
+def eliminate(factors, keep, order):
+    """
+    Sums every variable except `keep` out of the product of `factors`,
+    eliminating variables in `order`. Each factor waits in the bucket of
+    its first variable in the order, so every step multiplies only the
+    factors mentioning the variable being eliminated.
+    Returns a factor over `keep` alone.
+    """
+    order = [v for v in order if v != keep] + [keep]
+    rank = {v: i for i, v in enumerate(order)}
+    buckets = [[] for _ in order]
+
+    def place(factor):
+        buckets[min(rank[v] for v in factor.variables)].append(factor)
+
+    for factor in factors:
+        place(factor)
+
+    # Multiply each bucket's factors, then sum its variable out
+    for variable, bucket in zip(order[:-1], buckets):
+        if not bucket:
+            continue
+        product = bucket[0]
+        for factor in bucket[1:]:
+            product = product.multiply(factor)
+        product = product.sum_out(variable).scaled()
+        if product.variables:
+            place(product)
+
+    result = Factor((keep,), {(g,): 1 for g in GENES})
+    for factor in buckets[-1]:
+        result = result.multiply(factor)
+    return result
+
+
+def marginals(people, inheritance=None):
+    """
+    Returns each person's gene and trait distributions given the known
+    traits, in the same form as `heredity.main` computes by enumeration.
+    """
+    pedigree = compiled(people)
+    network = factors(pedigree, inheritance)
+    order = elimination_order(network)
+    probabilities = dict()
+    for name in people:
+        person = pedigree.index[name]
+        factor = eliminate(network, person, order)
+        total = sum(factor.table.values())
+        gene = {g: factor.table[(g,)] / total for g in reversed(GENES)}
+
+        # Known traits are certain, and unknown ones follow from the gene
+        trait = pedigree.traits[person]
+        if trait is None:
+            p = sum(gene[g] * TRAIT[g, True] for g in GENES)
+            trait = {True: p, False: 1 - p}
+        else:
+            trait = {True: float(trait), False: float(not trait)}
+        probabilities[name] = {"gene": gene, "trait": trait}
+    return probabilities
+
+
+if __name__ == "__main__":
+    main()
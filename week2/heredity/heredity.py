@@ -1,7 +1,9 @@
 import csv
-import itertools
+import math
 import sys
 
+from collections.abc import Mapping
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -40,12 +42,48 @@ PROBS = {
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    if len(sys.argv) not in [2, 3] or sys.argv[2:] not in [[], ["pruned"]]:
+        sys.exit("Usage: python heredity.py data.csv [pruned]")
+    people = load_pedigree(sys.argv[1])
 
     # Keep track of gene and trait probabilities for each person
-    probabilities = {
+    probabilities = empty_probabilities(people)
+
+    # Enumerate gene assignments only, with traits factored out
+    if sys.argv[2:] == ["pruned"]:
+        pruned_enumeration(people, probabilities)
+
+    # Loop over all assignments of genes and traits that fit the evidence
+    else:
+        # Add joint probabilities relative to the largest seen so far,
+        # which keeps them in range however small they get
+        scale = -math.inf
+        for one_gene, two_genes, have_trait in assignments(people):
+            log_p = log_joint_probability(
+                people, one_gene, two_genes, have_trait
+            )
+            if log_p == -math.inf:
+                continue
+            if log_p > scale:
+                rescale(probabilities, math.exp(scale - log_p))
+                scale = log_p
+
+            # Update probabilities with new joint probability
+            p = math.exp(log_p - scale)
+            update(probabilities, one_gene, two_genes, have_trait, p)
+
+    # Ensure probabilities sum to 1
+    normalize(probabilities)
+
+    # Print results
+    print_probabilities(probabilities)
+
+
+def empty_probabilities(people):
+    """
+    Return gene and trait distributions for each person, all zero.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -60,32 +98,12 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
-
-    # Ensure probabilities sum to 1
-    normalize(probabilities)
-
-    # Print results
-    for person in people:
+def print_probabilities(probabilities):
+    """
+    Print each person's gene and trait distributions.
+    """
+    for person in probabilities:
         print(f"{person}:")
         for field in probabilities[person]:
             print(f"  {field.capitalize()}:")
@@ -101,11 +119,21 @@ def load_data(filename):
     mother, father must both be blank, or both be valid names in the CSV.
     trait should be 0 or 1 if trait is known, blank otherwise.
     """
+    return load_pedigree(filename).people
+
+
+def load_pedigree(filename):
+    """
+    Load data from a file as `load_data` does, and return it compiled
+    into a Pedigree, raising ValueError if it is not a valid pedigree.
+    """
     data = dict()
     with open(filename) as f:
         reader = csv.DictReader(f)
         for row in reader:
             name = row["name"]
+            if name in data:
+                raise ValueError(f"{name} appears more than once")
             data[name] = {
                 "name": name,
                 "mother": row["mother"] or None,
@@ -113,20 +141,234 @@ def load_data(filename):
                 "trait": (True if row["trait"] == "1" else
                           False if row["trait"] == "0" else None)
             }
-    return data
+
+    return Pedigree(data)
+
+
+class Pedigree(Mapping):
+    """
+    Family compiled for inference: everyone in an order where parents come
+    before their children, known by their position in that order, with
+    lists indexed by position instead of dicts keyed by name.
+
+    A pedigree is also a read-only mapping from names to people, in the
+    order given, so it can be passed wherever `people` is expected and
+    each function given one uses it rather than compiling it again.
+    """
+
+    def __init__(self, people):
+        """
+        Compile `people`, as returned by `load_data`, raising ValueError
+        if anyone has only one parent, a parent not in the family, the
+        same person as both parents, or is their own ancestor.
+        """
+        self.people = people
+        for name, person in people.items():
+            mother, father = person["mother"], person["father"]
+            if (mother is None) != (father is None):
+                raise ValueError(f"{name} has only one parent")
+            for parent in (mother, father):
+                if parent is not None and parent not in people:
+                    raise ValueError(f"{name}'s parent {parent} is not in "
+                                     "the family")
+            if mother is not None and mother == father:
+                raise ValueError(f"{name} has {mother} as both parents")
+
+        # Place people after their parents, keeping the given order
+        # otherwise, with a stack rather than recursion for deep families
+        self.names = []
+        placed = dict()
+        for name in people:
+            stack = [name]
+            while stack:
+                person = stack[-1]
+                if placed.get(person) is True:
+                    stack.pop()
+                    continue
+                placed[person] = False
+                unplaced = [
+                    parent for parent in (people[person]["mother"],
+                                          people[person]["father"])
+                    if parent is not None and placed.get(parent) is not True
+                ]
+                if not unplaced:
+                    placed[person] = True
+                    self.names.append(person)
+                    stack.pop()
+                    continue
+                for parent in unplaced:
+                    if parent in placed:
+                        raise ValueError(f"{parent} is their own ancestor")
+                stack.extend(reversed(unplaced))
+
+        # Dense ids, and each person's parents' ids, or -1 if unknown
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.mothers = [-1] * len(self.names)
+        self.fathers = [-1] * len(self.names)
+        self.children = [[] for _ in self.names]
+        for i, name in enumerate(self.names):
+            if people[name]["mother"] is not None:
+                mother = self.index[people[name]["mother"]]
+                father = self.index[people[name]["father"]]
+                self.mothers[i], self.fathers[i] = mother, father
+                self.children[mother].append((i, father))
+                self.children[father].append((i, mother))
+        self.traits = [people[name]["trait"] for name in self.names]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, name):
+        return self.people[name]
+
+    def __iter__(self):
+        return iter(self.people)
+
+
+def compiled(people):
+    """
+    Return `people` as a Pedigree, compiling it only if it is not one.
+    """
+    if isinstance(people, Pedigree):
+        return people
+    return Pedigree(people)
 
 
 def powerset(s):
     """
-    Return a list of all possible subsets of set s.
+    Generate all possible subsets of set s, one at a time.
     """
     s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
+    for mask in range(1 << len(s)):
+        yield subset(s, mask)
+
+
+def assignments(people):
+    """
+    Generate every assignment of gene counts and traits to `people` that
+    agrees with the known traits, as tuples (one_gene, two_genes,
+    have_trait) of sets of names.
+
+    Each assignment is encoded as bitmasks over the people, one bit per
+    person, and decoded only when it is generated, so memory use does not
+    grow with the number of assignments. Trait masks are built from the
+    known traits rather than filtered against them.
+    """
+    names = list(people)
+    everyone = (1 << len(names)) - 1
+
+    # People whose trait is known, and those known to have it
+    known = has = 0
+    for i, name in enumerate(names):
+        if people[name]["trait"] is not None:
+            known |= 1 << i
+            if people[name]["trait"]:
+                has |= 1 << i
+
+    for traits in submasks(everyone & ~known):
+        have_trait = subset(names, traits | has)
+        for two in submasks(everyone):
+            two_genes = subset(names, two)
+            for one in submasks(everyone & ~two):
+                yield subset(names, one), two_genes, have_trait
+
+
+def submasks(mask):
+    """
+    Generate every bitmask whose set bits are all set in `mask`.
+    """
+    sub = mask
+    while True:
+        yield sub
+        if sub == 0:
+            return
+        sub = (sub - 1) & mask
+
+
+def subset(names, mask):
+    """
+    Return the set of names whose bits are set in `mask`.
+    """
+    result = set()
+    while mask:
+        low = mask & -mask
+        result.add(names[low.bit_length() - 1])
+        mask ^= low
+    return result
+
+
+def pruned_enumeration(people, probabilities):
+    """
+    Add to `probabilities` the joint probability of every assignment of
+    gene counts that agrees with the known traits, without normalizing.
+
+    Traits are factored out of the enumeration: a known trait contributes
+    its likelihood given the person's gene count, and an unknown trait
+    sums to 1 over its two values, so only gene counts are enumerated.
+    People are assigned depth first, parents before children, carrying
+    the product of factors so far, so each factor is multiplied in once
+    per partial assignment rather than once per complete one, and
+    branches whose product is 0 are skipped. A child's distribution of
+    gene counts is looked up by their parents' gene counts.
+    """
+    pedigree = compiled(people)
+    n = len(pedigree)
+    mothers, fathers, traits = (pedigree.mothers, pedigree.fathers,
+                                pedigree.traits)
+    p_trait = [TRAIT[g, True] for g in range(3)]
+
+    # Likelihood of each person's known trait, or 1 if unknown
+    likelihood = [
+        [1 if trait is None else TRAIT[g, trait] for g in range(3)]
+        for trait in traits
     ]
 
+    # Distribution of a child's gene count, by their parents' gene counts
+    inheritance = {
+        (mother, father): [INHERITANCE[g, mother, father] for g in range(3)]
+        for mother in range(3) for father in range(3)
+    }
+
+    # Running totals by position, copied into `probabilities` at the end
+    genes = [0] * n
+    gene_totals = [[0, 0, 0] for _ in range(n)]
+    trait_totals = [0] * n
+
+    def add(p):
+        for i in range(n):
+            g = genes[i]
+            gene_totals[i][g] += p
+            if traits[i] is None:
+                trait_totals[i] += p * p_trait[g]
+
+    def assign(i, p):
+        # Skip branches that cannot contribute
+        if p == 0:
+            return
+        if i == n:
+            add(p)
+            return
+        if mothers[i] < 0:
+            distribution = PRIOR
+        else:
+            distribution = inheritance[genes[mothers[i]], genes[fathers[i]]]
+        for g in range(3):
+            genes[i] = g
+            assign(i + 1, p * distribution[g] * likelihood[i][g])
+
+    assign(0, 1)
+
+    for i, person in enumerate(pedigree.names):
+        total = sum(gene_totals[i])
+        for g in range(3):
+            probabilities[person]["gene"][g] += gene_totals[i][g]
+        # Known traits hold in every assignment that agrees with them
+        if traits[i] is None:
+            probabilities[person]["trait"][True] += trait_totals[i]
+            probabilities[person]["trait"][False] += total - trait_totals[i]
+        else:
+            probabilities[person]["trait"][traits[i]] += total
+
 
 def joint_probability(people, one_gene, two_genes, have_trait):
     """
@@ -139,47 +381,117 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
     """
+    return math.prod(
+        person_probabilities(people, one_gene, two_genes, have_trait)
+    )
 
-    def calculate_gene_prob(person, one_gene, two_genes):
-        # No parents
-        if people[person]["mother"] is None and people[person]["father"] is None:
-            return PROBS["gene"][person["gene_count"]]
-        # Parents
-        else:
-            if person in one_gene:
-                # TODO
-            if person in two_genes:
-                # TODO
-            else:
-                
-            
-
-    def calculate_trait_prob(person, have_trait):
+
+def log_joint_probability(people, one_gene, two_genes, have_trait):
+    """
+    Compute and return the natural logarithm of the joint probability,
+    which unlike the probability itself does not underflow to 0 as the
+    number of people grows. Impossible assignments give -inf.
+    """
+    # The product is exact enough unless it left the range of floats
+    p = joint_probability(people, one_gene, two_genes, have_trait)
+    if p >= sys.float_info.min:
+        return math.log(p)
+
+    log_p = 0
+    for p in person_probabilities(people, one_gene, two_genes, have_trait):
+        if p == 0:
+            return -math.inf
+        log_p += math.log(p)
+    return log_p
+
+
+def person_probabilities(people, one_gene, two_genes, have_trait):
+    """
+    Generate, for each person, the probability of their gene count given
+    their parents' and of their trait given their gene count, whose
+    product over everyone is the joint probability. Each is a lookup in
+    the tables of factors computed once from PROBS, with people and their
+    parents known by their ids in `people` compiled as a Pedigree.
+    """
+    pedigree = compiled(people)
+
+    # Number of copies of the gene each person has in this assignment
+    genes = [0] * len(pedigree)
+    for person in one_gene:
+        genes[pedigree.index[person]] = 1
+    for person in two_genes:
+        genes[pedigree.index[person]] = 2
+
+    for i, g in enumerate(genes):
+        mother = pedigree.mothers[i]
         # No parents
-        if people[person]["mother"] is None and people[person]["father"] is None:
-            return PROBS["trait"][person["gene_count"]][person["trait"]]
-        
+        if mother < 0:
+            gene_prob = PRIOR[g]
         # Parents
         else:
+            gene_prob = INHERITANCE[g, genes[mother],
+                                    genes[pedigree.fathers[i]]]
+        yield gene_prob * TRAIT[g, pedigree.names[i] in have_trait]
+
+
+def inherit_probability(genes):
+    """
+    Return the probability that a parent with `genes` copies of the gene
+    passes a copy on to their child, taking mutation into account.
+    """
+    mutation = PROBS["mutation"]
+    if genes == 2:
+        return 1 - mutation
+    if genes == 1:
+        return 0.5
+    return mutation
 
-    
-    for person in people:
-        if person in one_gene:
-            person["gene_count"] = 1
-        elif person in two_genes:
-            person["gene_count"] = 2
-        else:
-            person["gene_count"] = 0
-        person["gene_prob"] = calculate_gene_prob(person, one_gene, two_genes)
-        if person in have_trait:
-            person["trait"] = True
-        else:
-            person["trait"] = False
-        person["trait_prob"] = calculate_trait_prob(person, have_trait)
 
-    joint_prob = 1
-    for person in people:
-        joint_prob *= person["gene_prob"] * person["trait_prob"]
+def child_gene_probability(genes, from_mother, from_father):
+    """
+    Return the probability that a child has `genes` copies of the gene,
+    given the probabilities that their mother and father pass one on.
+    """
+    if genes == 2:
+        return from_mother * from_father
+    if genes == 1:
+        return (from_mother * (1 - from_father) +
+                (1 - from_mother) * from_father)
+    return (1 - from_mother) * (1 - from_father)
+
+
+def inheritance_table():
+    """
+    Return the probability of each child's gene count given their
+    parents', keyed by (child, mother, father) gene counts.
+    """
+    table = dict()
+    for mother in range(3):
+        for father in range(3):
+            from_mother = inherit_probability(mother)
+            from_father = inherit_probability(father)
+            for child in range(3):
+                table[child, mother, father] = child_gene_probability(
+                    child, from_mother, from_father
+                )
+    return table
+
+
+def trait_table():
+    """
+    Return the probability of each trait given the gene count, keyed by
+    (genes, trait).
+    """
+    return {
+        (genes, trait): PROBS["trait"][genes][trait]
+        for genes in range(3) for trait in (True, False)
+    }
+
+
+# Factors of the joint probability, computed once from PROBS
+PRIOR = [PROBS["gene"][g] for g in range(3)]
+INHERITANCE = inheritance_table()
+TRAIT = trait_table()
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
@@ -203,6 +515,16 @@ def update(probabilities, one_gene, two_genes, have_trait, p):
             probabilities[person]["trait"][False] += p
 
 
+def rescale(probabilities, factor):
+    """
+    Multiply every probability in `probabilities` by `factor`.
+    """
+    for person in probabilities:
+        for field in probabilities[person]:
+            for value in probabilities[person][field]:
+                probabilities[person][field][value] *= factor
+
+
 def normalize(probabilities):
     """
     Update `probabilities` such that each probability distribution
@@ -0,0 +1,211 @@
+import itertools
+import sys
+
+from elimination import (GENES, Factor, elimination_order, gene_factor,
+                         trait_factor)
+from heredity import (INHERITANCE, TRAIT, compiled, load_pedigree,
+                      print_probabilities)
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python junction.py data.csv [name=0|1|? ...]")
+    people = load_pedigree(sys.argv[1])
+    tree = JunctionTree(people)
+    tree.marginals()
+
+    # Apply each change of evidence, then show the updated marginals
+    for change in sys.argv[2:]:
+        name, _, value = change.partition("=")
+        if name not in people or value not in ["0", "1", "?"]:
+            sys.exit(f"Invalid evidence: {change}")
+        tree.observe(name, None if value == "?" else value == "1")
+
+    computed = tree.computed
+    print_probabilities(tree.marginals())
+    print(f"Messages computed after changes: {tree.computed - computed} "
+          f"of {2 * (len(people) - tree.roots)}")
+
+
+class JunctionTree:
+    """
+    Pedigree compiled into a tree of cliques of people, which answers
+    queries for any person's gene and trait distributions from messages
+    passed between cliques. Messages are kept until evidence that they
+    depend on changes, so after a person's trait is observed, only the
+    messages leading away from that person are computed again.
+    """
+
+    def __init__(self, people, inheritance=None):
+        if inheritance is None:
+            inheritance = INHERITANCE
+        self.people = people
+        self.pedigree = compiled(people)
+        n = len(self.pedigree)
+        self.traits = list(self.pedigree.traits)
+        self.gene_factors = [
+            gene_factor(self.pedigree, person, inheritance)
+            for person in range(n)
+        ]
+
+        # Eliminating people in order gives a clique for each of them:
+        # the person and everyone linked to them when they are eliminated
+        order = elimination_order(self.gene_factors)
+        rank = [0] * n
+        for i, person in enumerate(order):
+            rank[person] = i
+        links = [set() for _ in range(n)]
+        for factor in self.gene_factors:
+            for v in factor.variables:
+                links[v].update(factor.variables)
+        for v in range(n):
+            links[v].discard(v)
+        self.cliques = [None] * n
+        for person in order:
+            neighbors = links[person]
+            self.cliques[person] = (person,) + tuple(neighbors)
+            for v in neighbors:
+                links[v].discard(person)
+                links[v].update(neighbors - {v})
+
+        # Each clique's parent is the clique of the first of its other
+        # people to be eliminated, and it joins no other clique if alone
+        self.neighbors = [[] for _ in range(n)]
+        self.roots = 0
+        for person, clique in enumerate(self.cliques):
+            if len(clique) == 1:
+                self.roots += 1
+                continue
+            parent = min(clique[1:], key=rank.__getitem__)
+            self.neighbors[person].append(parent)
+            self.neighbors[parent].append(person)
+
+        # Each factor belongs to the clique of its first person eliminated
+        self.assigned = [[] for _ in range(n)]
+        for person, factor in enumerate(self.gene_factors):
+            home = min(factor.variables, key=rank.__getitem__)
+            self.assigned[home].append(person)
+
+        # Cached potentials of cliques, and messages between them
+        self.potentials = dict()
+        self.messages = dict()
+        self.computed = 0
+
+    def observe(self, name, trait):
+        """
+        Sets whether the person called `name` has the trait, True or
+        False, or None if it is unknown, and forgets every message that
+        depended on it.
+        """
+        person = self.pedigree.index[name]
+        if self.traits[person] == trait:
+            return
+        self.traits[person] = trait
+
+        # Only the trait's own clique changes, so only messages leading
+        # away from it go stale. A message that is not cached has no
+        # cached messages depending on it beyond, so the search ends there.
+        clique = person
+        self.potentials.pop(clique, None)
+        frontier = [(clique, neighbor) for neighbor in self.neighbors[clique]]
+        while frontier:
+            source, target = frontier.pop()
+            if self.messages.pop((source, target), None) is None:
+                continue
+            frontier.extend(
+                (target, neighbor) for neighbor in self.neighbors[target]
+                if neighbor != source
+            )
+
+    def potential(self, clique):
+        """
+        Returns the product of the factors belonging to `clique`, over
+        every person in it.
+        """
+        if clique not in self.potentials:
+            variables = self.cliques[clique]
+            result = Factor(variables, dict.fromkeys(
+                itertools.product(GENES, repeat=len(variables)), 1
+            ))
+            for person in self.assigned[clique]:
+                result = result.multiply(self.gene_factors[person])
+            if self.traits[clique] is not None:
+                result = result.multiply(
+                    trait_factor(clique, self.traits[clique])
+                )
+            self.potentials[clique] = result
+        return self.potentials[clique]
+
+    def message(self, source, target):
+        """
+        Returns the message from clique `source` to clique `target`,
+        computing it and any messages it depends on that are not cached.
+        """
+        stack = [(source, target)]
+        while stack:
+            source, target = stack[-1]
+            if (source, target) in self.messages:
+                stack.pop()
+                continue
+            missing = [
+                (neighbor, source) for neighbor in self.neighbors[source]
+                if neighbor != target and
+                (neighbor, source) not in self.messages
+            ]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+
+            # Combine everything reaching source from elsewhere, and sum
+            # out everyone target does not share
+            product = self.potential(source)
+            for neighbor in self.neighbors[source]:
+                if neighbor != target:
+                    product = product.multiply(
+                        self.messages[(neighbor, source)]
+                    )
+            shared = set(self.cliques[target])
+            for v in self.cliques[source]:
+                if v not in shared:
+                    product = product.sum_out(v)
+            self.messages[(source, target)] = product.scaled()
+            self.computed += 1
+        return self.messages[(source, target)]
+
+    def marginal(self, name):
+        """
+        Returns the gene and trait distributions of the person called
+        `name` given the evidence.
+        """
+        person = self.pedigree.index[name]
+        belief = self.potential(person)
+        for neighbor in self.neighbors[person]:
+            belief = belief.multiply(self.message(neighbor, person))
+        for v in self.cliques[person]:
+            if v != person:
+                belief = belief.sum_out(v)
+        total = sum(belief.table.values())
+        gene = {g: belief.table[(g,)] / total for g in reversed(GENES)}
+
+        # Known traits are certain, and unknown ones follow from the gene
+        trait = self.traits[person]
+        if trait is None:
+            p = sum(gene[g] * TRAIT[g, True] for g in GENES)
+            trait = {True: p, False: 1 - p}
+        else:
+            trait = {True: float(trait), False: float(not trait)}
+        return {"gene": gene, "trait": trait}
+
+    def marginals(self):
+        """
+        Returns every person's gene and trait distributions given the
+        evidence, in the same form as `heredity.main` computes.
+        """
+        return {name: self.marginal(name) for name in self.people}
+
+
+if __name__ == "__main__":
+    main()
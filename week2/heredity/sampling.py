@@ -0,0 +1,326 @@
+import math
+import multiprocessing
+import random
+import sys
+
+from heredity import (INHERITANCE, PRIOR, TRAIT, compiled,
+                      load_pedigree, print_probabilities)
+
+# Sampling methods, by name on the command line
+METHODS = ["likelihood", "gibbs"]
+
+# Fraction of each Gibbs chain discarded while it moves away from its start
+BURN_IN = 0.1
+
+
+def main():
+
+    # Check for proper usage
+    if (len(sys.argv) not in [4, 5] or sys.argv[2] not in METHODS or
+            not all(arg.isdigit() and int(arg) > 0 for arg in sys.argv[3:])):
+        sys.exit("Usage: python sampling.py data.csv likelihood|gibbs "
+                 "samples [chains]")
+    people = load_pedigree(sys.argv[1])
+    method = sys.argv[2]
+    samples = int(sys.argv[3])
+    chains = int(sys.argv[4]) if len(sys.argv) == 5 else 1
+
+    probabilities, diagnostics = sample(people, method, samples, chains)
+    print_probabilities(probabilities)
+    for name, value in diagnostics.items():
+        print(f"{name}: {value:.4f}")
+
+
+def network(people):
+    """
+    Returns the pedigree as lists indexed by each person's id in its
+    compiled `Pedigree`: names, each person's parents' ids or None, each
+    person's children's ids, each person's known trait or None, and the
+    likelihood of each person's known trait given each gene count, or 1
+    if the trait is unknown.
+    """
+    pedigree = compiled(people)
+    parents = [
+        None if mother < 0 else (mother, father)
+        for mother, father in zip(pedigree.mothers, pedigree.fathers)
+    ]
+    likelihood = [
+        [1 if trait is None else TRAIT[g, trait] for g in range(3)]
+        for trait in pedigree.traits
+    ]
+    return {
+        "names": pedigree.names,
+        "parents": parents,
+        "children": [
+            [child for child, _ in children] for children in pedigree.children
+        ],
+        "traits": pedigree.traits,
+        "likelihood": likelihood,
+    }
+
+
+def choose(rng, weights):
+    """
+    Returns an index into `weights` chosen with probability in proportion
+    to its weight.
+    """
+    r = rng.random() * sum(weights)
+    for i, weight in enumerate(weights):
+        r -= weight
+        if r < 0:
+            return i
+    return len(weights) - 1
+
+
+def likelihood_weighting(net, samples, seed):
+    """
+    Draws `samples` gene assignments from the pedigree, parents before
+    children, weighting each by the likelihood of the known traits.
+    Returns each person's weighted totals for each gene count and for
+    having the trait, along with the sum of the weights and of their
+    squares.
+
+    With many known traits the weights are far too small for floats, so
+    they are computed as logarithms and added relative to the largest so
+    far, whose logarithm is returned as the scale of the totals.
+    """
+    rng = random.Random(seed)
+    n = len(net["names"])
+    p_trait = [TRAIT[g, True] for g in range(3)]
+    log_likelihood = [
+        [math.log(p) if p > 0 else -math.inf for p in likelihood]
+        for likelihood in net["likelihood"]
+    ]
+    gene_totals = [[0, 0, 0] for _ in range(n)]
+    trait_totals = [0] * n
+    total = squares = 0
+    scale = -math.inf
+
+    genes = [0] * n
+    for _ in range(samples):
+        log_weight = 0
+        for i, parents in enumerate(net["parents"]):
+            if parents is None:
+                distribution = PRIOR
+            else:
+                mother, father = parents
+                distribution = [
+                    INHERITANCE[g, genes[mother], genes[father]]
+                    for g in range(3)
+                ]
+            genes[i] = choose(rng, distribution)
+            log_weight += log_likelihood[i][genes[i]]
+        if log_weight == -math.inf:
+            continue
+
+        # Rescale the totals so far whenever the scale grows
+        if log_weight > scale:
+            factor = math.exp(scale - log_weight)
+            for i in range(n):
+                for g in range(3):
+                    gene_totals[i][g] *= factor
+                trait_totals[i] *= factor
+            total *= factor
+            squares *= factor * factor
+            scale = log_weight
+        weight = math.exp(log_weight - scale)
+
+        # Unknown traits are averaged over rather than sampled
+        for i, g in enumerate(genes):
+            gene_totals[i][g] += weight
+            trait_totals[i] += weight * p_trait[g]
+        total += weight
+        squares += weight * weight
+
+    return {
+        "gene": gene_totals,
+        "trait": trait_totals,
+        "weight": total,
+        "squares": squares,
+        "scale": scale,
+    }
+
+
+def gibbs(net, samples, seed):
+    """
+    Runs a Gibbs sampler over everyone's gene counts for `samples` sweeps,
+    starting from a draw from the pedigree without evidence. Each step
+    redraws one person's gene count given their parents', their
+    children's and their children's other parents', and their known
+    trait. After burn-in, each step adds that person's conditional
+    distribution to their totals, rather than the single value drawn.
+
+    Returns each person's totals for each gene count and for having the
+    trait, the number of sweeps counted, and the sums of each person's
+    gene count and its square over each half of the counted sweeps.
+    """
+    rng = random.Random(seed)
+    n = len(net["names"])
+    p_trait = [TRAIT[g, True] for g in range(3)]
+    parents, children = net["parents"], net["children"]
+    likelihood = net["likelihood"]
+
+    # Start from a draw ignoring the evidence
+    genes = [0] * n
+    for i in range(n):
+        if parents[i] is None:
+            genes[i] = choose(rng, PRIOR)
+        else:
+            mother, father = parents[i]
+            genes[i] = choose(rng, [
+                INHERITANCE[g, genes[mother], genes[father]] for g in range(3)
+            ])
+
+    gene_totals = [[0, 0, 0] for _ in range(n)]
+    trait_totals = [0] * n
+    burn_in = int(samples * BURN_IN)
+    counted = samples - burn_in
+    length = counted // 2
+    halves = [[[0, 0] for _ in range(n)] for _ in range(2)]
+
+    for sweep in range(samples):
+        for i in range(n):
+            distribution = [0, 0, 0]
+            for g in range(3):
+                if parents[i] is None:
+                    p = PRIOR[g]
+                else:
+                    mother, father = parents[i]
+                    p = INHERITANCE[g, genes[mother], genes[father]]
+                p *= likelihood[i][g]
+
+                # Try g in place, so each child sees it as the right parent
+                genes[i] = g
+                for child in children[i]:
+                    mother, father = parents[child]
+                    p *= INHERITANCE[genes[child], genes[mother],
+                                     genes[father]]
+                distribution[g] = p
+            genes[i] = choose(rng, distribution)
+
+            if sweep >= burn_in:
+                total = sum(distribution)
+                for g in range(3):
+                    gene_totals[i][g] += distribution[g] / total
+                    trait_totals[i] += distribution[g] / total * p_trait[g]
+
+        # Keep sums for convergence diagnostics on each half of the chain,
+        # leaving out the last sweep if there is an odd number
+        k = sweep - burn_in
+        if 0 <= k < 2 * length:
+            half = halves[k // length]
+            for i, g in enumerate(genes):
+                half[i][0] += g
+                half[i][1] += g * g
+
+    return {
+        "gene": gene_totals,
+        "trait": trait_totals,
+        "weight": counted,
+        "halves": halves,
+        "length": length,
+    }
+
+
+def split_r_hat(chains):
+    """
+    Returns the largest potential scale reduction factor over everyone's
+    gene count, comparing the halves of every Gibbs chain in `chains`.
+    Values near 1 mean the chains agree; values above about 1.1 mean
+    more samples are needed.
+
+    Chains given one more sample than others may have longer halves, so
+    each half's mean and variance use its own length, and the shortest
+    length weighs them together.
+    """
+    halves = [half for chain in chains for half in chain["halves"]]
+    lengths = [chain["length"] for chain in chains for _ in range(2)]
+    length = min(lengths)
+    if length < 2:
+        return math.inf
+    worst = 1
+    for i in range(len(halves[0])):
+        means = [half[i][0] / n for half, n in zip(halves, lengths)]
+        variances = [
+            (half[i][1] - n * mean ** 2) / (n - 1)
+            for half, n, mean in zip(halves, lengths, means)
+        ]
+        within = sum(variances) / len(variances)
+        mean = sum(means) / len(means)
+        between = length * sum((m - mean) ** 2 for m in means) / (
+            len(means) - 1
+        )
+        if within > 0:
+            variance = (length - 1) / length * within + between / length
+            worst = max(worst, math.sqrt(variance / within))
+    return worst
+
+
+def sample(people, method, samples, chains=1, seed=0):
+    """
+    Estimates each person's gene and trait distributions given the known
+    traits with `method`, "likelihood" or "gibbs", spending `samples`
+    samples or sweeps in total across `chains` chains, which run in
+    separate processes if there is more than one.
+
+    Returns the distributions, in the same form as `heredity.main`
+    computes exactly, and a dict of convergence diagnostics. Raises
+    ValueError unless `samples` and `chains` are positive.
+    """
+    if samples < 1 or chains < 1:
+        raise ValueError("samples and chains must be positive")
+    net = network(people)
+    run = likelihood_weighting if method == "likelihood" else gibbs
+    budgets = [
+        samples // chains + (i < samples % chains) for i in range(chains)
+    ]
+    jobs = [(net, budget, seed + i) for i, budget in enumerate(budgets)]
+    if chains > 1:
+        processes = min(chains, multiprocessing.cpu_count())
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(run, jobs)
+    else:
+        results = [run(*job) for job in jobs]
+
+    # Bring likelihood weighting chains to a common scale
+    if method == "likelihood":
+        scale = max(result["scale"] for result in results)
+        for result in results:
+            if result["scale"] == -math.inf:
+                continue
+            factor = math.exp(result["scale"] - scale)
+            for i in range(len(result["gene"])):
+                result["gene"][i] = [t * factor for t in result["gene"][i]]
+                result["trait"][i] *= factor
+            result["weight"] *= factor
+            result["squares"] *= factor * factor
+
+    # Combine chains, weighting each by its total weight
+    weight = sum(result["weight"] for result in results)
+    probabilities = dict()
+    for i, name in enumerate(net["names"]):
+        gene = [sum(result["gene"][i][g] for result in results) / weight
+                for g in range(3)]
+        trait = net["traits"][i]
+        if trait is None:
+            p = sum(result["trait"][i] for result in results) / weight
+            trait = {True: p, False: 1 - p}
+        else:
+            trait = {True: float(trait), False: float(not trait)}
+        probabilities[name] = {
+            "gene": {g: gene[g] for g in (2, 1, 0)},
+            "trait": trait,
+        }
+
+    if method == "likelihood":
+        squares = sum(result["squares"] for result in results)
+        diagnostics = {"effective samples": weight ** 2 / squares}
+    else:
+        diagnostics = {"max split R-hat": split_r_hat(results)}
+    # List people in the order they were given
+    probabilities = {name: probabilities[name] for name in people}
+    return probabilities, diagnostics
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import sys
+
+import numpy as np
+
+from heredity import (INHERITANCE, PRIOR, TRAIT, compiled,
+                      load_pedigree, print_probabilities)
+
+# Gene assignments scored per batch, bounding memory use
+BATCH = 1 << 16
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python vectorized.py data.csv")
+    people = load_pedigree(sys.argv[1])
+
+    print_probabilities(marginals(people))
+
+
+def tables():
+    """
+    Returns the tables of factors from heredity.py as arrays: the
+    probability of each gene count for people without parents, indexed
+    [genes]; of a child's gene count given their parents', indexed
+    [child, mother, father]; and of a trait given the gene count, indexed
+    [genes, trait].
+    """
+    prior = np.array(PRIOR)
+    inheritance = np.empty((3, 3, 3))
+    trait = np.empty((3, 2))
+    for (child, mother, father), p in INHERITANCE.items():
+        inheritance[child, mother, father] = p
+    for (genes, value), p in TRAIT.items():
+        trait[genes, int(value)] = p
+    return prior, inheritance, trait
+
+
+def gene_assignments(n, start, stop):
+    """
+    Returns assignments `start` to `stop` of gene counts to `n` people as
+    an integer array with one row per assignment, reading each row as the
+    digits of its index in base 3.
+    """
+    index = np.arange(start, stop, dtype=np.int64)
+    return (index[:, None] // 3 ** np.arange(n, dtype=np.int64)) % 3
+
+
+def joint_probabilities(genes, traits, parents, tables):
+    """
+    Returns the joint probability of each row of `genes` with the known
+    `traits`, a list with True, False or None for each person. `parents`
+    holds for each person the positions of their mother and father, or
+    None. Unknown traits are summed out, which leaves a factor of 1.
+    """
+    prior, inheritance, trait = tables
+    p = np.ones(len(genes))
+    for i, person_parents in enumerate(parents):
+        if person_parents is None:
+            p *= prior[genes[:, i]]
+        else:
+            mother, father = person_parents
+            p *= inheritance[genes[:, i], genes[:, mother], genes[:, father]]
+        if traits[i] is not None:
+            p *= trait[genes[:, i], int(traits[i])]
+    return p
+
+
+def update(gene_totals, trait_totals, genes, traits, p, trait):
+    """
+    Adds the joint probabilities `p` of the rows of `genes` to each
+    person's totals for each gene count and trait value. A known trait
+    takes all of each row's probability, and an unknown one splits it by
+    `trait`, the probability of each trait value given the gene count.
+    """
+    total = p.sum()
+    for i in range(genes.shape[1]):
+        gene_totals[i] += np.bincount(genes[:, i], p, minlength=3)
+        if traits[i] is None:
+            trait_totals[i] += p @ trait[genes[:, i]]
+        else:
+            trait_totals[i, int(traits[i])] += total
+
+
+def normalize(totals):
+    """
+    Scales each row of `totals` to sum to 1.
+    """
+    return totals / totals.sum(axis=1, keepdims=True)
+
+
+def marginals(people):
+    """
+    Returns each person's gene and trait distributions given the known
+    traits, scoring every assignment of gene counts in batches of arrays
+    and summing out the unknown traits, in the same form as
+    `heredity.main` computes one at a time.
+    """
+    pedigree = compiled(people)
+    n = len(pedigree)
+    parents = [
+        None if mother < 0 else (mother, father)
+        for mother, father in zip(pedigree.mothers, pedigree.fathers)
+    ]
+    lookup = tables()
+
+    gene_totals = np.zeros((n, 3))
+    trait_totals = np.zeros((n, 2))
+    for start in range(0, 3 ** n, BATCH):
+        genes = gene_assignments(n, start, min(start + BATCH, 3 ** n))
+        p = joint_probabilities(genes, pedigree.traits, parents, lookup)
+        update(gene_totals, trait_totals, genes, pedigree.traits, p,
+               lookup[2])
+    gene_totals = normalize(gene_totals)
+    trait_totals = normalize(trait_totals)
+
+    probabilities = dict()
+    for name in people:
+        i = pedigree.index[name]
+        probabilities[name] = {
+            "gene": {g: float(gene_totals[i, g]) for g in (2, 1, 0)},
+            "trait": {True: float(trait_totals[i, 1]),
+                      False: float(trait_totals[i, 0])},
+        }
+    return probabilities
+
+
+if __name__ == "__main__":
+    main()